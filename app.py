@@ -12,18 +12,33 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
-import requests
 from langchain_community.llms import Ollama
 from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.prompts import PromptTemplate
-from pypdf import PdfReader
-import subprocess
-import platform
-import fitz  # PyMuPDF
+from index_cache import get_index_cache, make_index_key
+from ollama_embeddings import BatchedOllamaEmbeddings
+from embedding_store import CachedEmbeddings
+from pdf_extract import get_backend, EXTRACTION_BACKENDS, PDF_TEXT_BACKEND
+from ingestion import IngestionJob
+from pdf_document import get_upload_document
+from render_cache import get_page_render_cache
+from static_assets import get_static_asset_store
+from streaming import ANSWER_STREAM_TAG, CallbackStream, StreamTimer, ThrottledMarkdown, queue_position_notifier, timed_tokens
+from llm_scheduler import PRIORITY_INTERACTIVE, get_llm_scheduler, request_context
+from ollama_client import PooledOllama, get_ollama_client
+from ollama_router import OllamaRouter
+from inference_profiles import inference_options, retrieval_context_tokens
+from response_cache import CachedStream, get_response_cache
+from semantic_cache import get_semantic_answer_cache
+from query_rewrite import has_anaphora
+from langchain.globals import set_llm_cache
+from model_catalog import get_model_catalog
+from model_manager import get_model_manager
+from conversation_memory import ConversationBudget, ConversationBudgetMemory, history_budget_tokens
+from context_packing import PackingRetriever, context_budget_tokens, packing_report
+from lexical_index import HybridRetriever
+from vector_index import BENCHMARK_K, FAISS_INDEX_TYPE, index_type_of
 
 # 대시보드 기능 가져오기
 try:
@@ -430,113 +445,98 @@ if "id" not in st.session_state:
     if "current_menu" not in st.session_state:
         st.session_state.current_menu = "PDF 문서 챗봇"
 
+# 체인 안의 LLM 호출에 디스크 응답 캐시 적용 (모델·생성 옵션·렌더링된 프롬프트가 같으면 재사용)
+set_llm_cache(get_response_cache())
+
 # 환경 변수 설정
-OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+# OLLAMA_BASE_URLS에 쉼표로 여러 서버를 지정하면 서버 간 부하 분산·장애 조치
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URLS") or os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "llama3.2")
 OLLAMA_CHAT_MODEL = os.environ.get("OLLAMA_CHAT_MODEL", "llama3.2")
 
+# PDF 청크 설정 (인덱스 캐시 키에도 사용됨)
+PDF_CHUNK_SIZE = 1000
+PDF_CHUNK_OVERLAP = 200
+# 질문마다 검색하는 청크 수 (LLM의 num_ctx 계산에도 사용됨)
+PDF_RETRIEVAL_K = 4
+# 검색 청크를 압축해 프롬프트에 넣는 토큰 예산 (압축과 num_ctx 계산에 같은 값을 사용)
+PDF_PACK_TOKENS = context_budget_tokens(PDF_RETRIEVAL_K, PDF_CHUNK_SIZE)
+
+# PDF 미리보기에서 한 번에 렌더링하는 페이지 수
+PREVIEW_WINDOW_PAGES = int(os.environ.get("PREVIEW_WINDOW_PAGES", "3"))
+
 # 유틸리티 함수
 def reset_chat():
     st.session_state.messages = []
     st.session_state.context = None
 
 # PDF 표시 함수 수정 - 스크롤 가능한 컨테이너 내에 이미지 표시
-def display_pdf(file):
+def display_pdf(document):
+    """업로드 문서 객체(PdfDocument)로 다운로드 버튼과 페이지 미리보기를 표시합니다."""
     try:
-        # PDF 파일 읽기
-        file.seek(0)
-        file_bytes = file.read()
-        
         # 다운로드 버튼
         st.download_button(
             label="PDF 다운로드",
-            data=file_bytes,
-            file_name=file.name,
+            data=document.raw,
+            file_name=document.name,
             mime="application/pdf"
         )
         
-        # PyMuPDF를 사용하여 PDF를 이미지로 변환
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        
-        # 페이지 수 확인
-        total_pages = len(doc)
+        # 페이지 수 확인 (문서 객체가 한 번 연 PyMuPDF 문서를 재사용)
+        total_pages = document.page_count
         
         if total_pages == 0:
             st.warning("PDF에 페이지가 없습니다.")
             return
         
-        # 미리보기 페이지 수 제한 (최대 5페이지)
-        preview_pages = min(5, total_pages)
-        
-        st.markdown(f"### PDF 미리보기 (총 {total_pages}페이지 중 {preview_pages}페이지 표시)")
-        
-        # 이미지 데이터를 저장할 리스트
-        images = []
-        captions = []
-        
-        # 각 페이지를 이미지로 변환
-        for page_num in range(preview_pages):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(matrix=fitz.Matrix(1.2, 1.2))  # 해상도 조정
-            img_bytes = pix.tobytes("png")
-            images.append(img_bytes)
-            captions.append(f"페이지 {page_num + 1}/{total_pages}")
-        
-        # 문서 닫기
-        doc.close()
-        
-        # 스크롤 가능한 컨테이너 생성
-        with st.container():
-            # 스크롤 가능한 영역 CSS 적용
-            st.markdown("""
-            <style>
-            .pdf-preview-box {
-                height: 500px;
-                overflow-y: auto;
-                border: 1px solid #e0e0e0;
-                border-radius: 10px;
-                padding: 15px;
-                background-color: #f9f9f9;
-                margin-bottom: 20px;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-            
-            # HTML로 스크롤 가능한 컨테이너 생성
-            html_content = '<div class="pdf-preview-box">'
-            
-            # 이미지를 base64로 인코딩하여 HTML에 추가
-            for i, img_bytes in enumerate(images):
-                img_base64 = base64.b64encode(img_bytes).decode()
-                html_content += f'<p style="text-align:center; color:#555; font-size:0.9rem;">{captions[i]}</p>'
-                html_content += f'<img src="data:image/png;base64,{img_base64}" style="width:100%; margin-bottom:15px; border:1px solid #ddd; border-radius:5px;">'
-                if i < len(images) - 1:
-                    html_content += '<hr style="border-top:1px dashed #ccc; margin:15px 0;">'
-            
-            html_content += '</div>'
-            
-            # HTML 렌더링
-            st.markdown(html_content, unsafe_allow_html=True)
-        
-        # 더 많은 페이지가 있는 경우 안내 메시지
-        if total_pages > preview_pages:
-            st.info(f"전체 {total_pages}페이지 중 {preview_pages}페이지만 미리보기로 표시됩니다. 전체 내용을 보려면 PDF를 다운로드하세요.")
+        # 미리보기 구간 선택 - 보고 있는 구간의 페이지만 렌더링
+        col_page, col_zoom = st.columns([2, 1])
+        with col_page:
+            start_page = st.number_input(
+                "미리보기 시작 페이지",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                step=PREVIEW_WINDOW_PAGES,
+                key=f"preview_page_{document.sha256}"
+            )
+        with col_zoom:
+            zoom = st.select_slider(
+                "배율",
+                options=[0.8, 1.0, 1.2, 1.5, 2.0],
+                value=1.2,
+                key="preview_zoom"
+            )
+        end_page = min(start_page + PREVIEW_WINDOW_PAGES - 1, total_pages)
+        
+        st.markdown(f"### PDF 미리보기 (총 {total_pages}페이지 중 {start_page}-{end_page}페이지 표시)")
+        
+        # 스크롤 가능한 컨테이너에 페이지 이미지 표시
+        # 렌더링 결과는 (문서 해시, 페이지, 배율)별로 캐시되어 재실행 시 다시 렌더링하지 않고,
+        # 정적 파일 URL로 참조하므로 브라우저가 한 번 받은 이미지는 다시 전송되지 않음
+        render_cache = get_page_render_cache()
+        asset_store = get_static_asset_store()
+        with st.container(height=500, border=True):
+            for page_num in range(start_page - 1, end_page):
+                image_url = asset_store.page_image_url(document, page_num, zoom, render_cache)
+                st.markdown(
+                    f'<p style="text-align:center; color:#555; font-size:0.9rem;">페이지 {page_num + 1}/{total_pages}</p>'
+                    f'<img src="{image_url}" loading="lazy" style="width:100%; margin-bottom:15px; border:1px solid #ddd; border-radius:5px;">',
+                    unsafe_allow_html=True
+                )
         
     except Exception as e:
         st.error(f"PDF 표시 중 오류가 발생했습니다: {e}")
         st.error("PDF 미리보기를 표시할 수 없습니다. 다운로드 버튼을 사용하여 PDF를 확인하세요.")
         
         # 오류 발생 시에도 다운로드 버튼 제공
-        file.seek(0)
         st.download_button(
             label="PDF 다운로드",
-            data=file.read(),
-            file_name=file.name,
-            mime="application/pdf"
+            data=document.raw,
+            file_name=document.name,
+            mime="application/pdf",
+            key="pdf_download_fallback"
         )
-    
-    # 파일 포인터 위치 초기화
-    file.seek(0)
 
 # 문서 교정 히스토리 저장 함수
 def save_correction_history(file_name, correction_type, errors_found, corrections_made):
@@ -1015,54 +1015,96 @@ def render_document_correction_dashboard():
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Ollama 설정 및 모델 관련 함수 수정
+def get_llm_options(model_name="llama3.2"):
+    """호스트 성능과 검색 컨텍스트 크기에 맞춘 추론 옵션 (num_ctx, num_predict, num_thread 등)을 반환합니다.
+
+    num_ctx와 num_thread는 모델별로 처음 정한 값을 미리 올리기, 속도 측정, 모든 LLM이 함께 사용합니다.
+    """
+    model_info = get_model_catalog(OLLAMA_BASE_URL).get(model_name)
+    return inference_options(
+        OLLAMA_BASE_URL, model_name,
+        retrieval_context_tokens(PDF_RETRIEVAL_K, PDF_CHUNK_SIZE, max_context_tokens=PDF_PACK_TOKENS),
+        model_context_length=model_info.context_length if model_info else None
+    )
+
 def get_ollama_llm(model_name="llama3.2"):
     """Ollama LLM 모델을 초기화합니다."""
     try:
-        # 명시적으로 llama3.2 모델과 base_url 지정
-        return Ollama(model="llama3.2", base_url=OLLAMA_BASE_URL)
+        options = get_llm_options("llama3.2")
+        # 명시적으로 llama3.2 모델과 base_url 지정 (공유 연결 풀 사용)
+        return PooledOllama(model="llama3.2", base_url=OLLAMA_BASE_URL, **options)
     except Exception as e:
         st.error(f"Ollama 모델 초기화 중 오류 발생: {e}")
         return None
 
-# PDF 처리 함수
-def process_pdf(pdf_file):
-    """PDF 파일을 처리하여 텍스트를 추출하고 벡터 저장소를 생성합니다."""
-    try:
-        # PDF에서 텍스트 추출
-        pdf_reader = PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() or ""
-        
-        if not text.strip():
-            st.warning("PDF에서 텍스트를 추출할 수 없습니다.")
-            return None
-        
-        # 텍스트 분할
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        chunks = text_splitter.split_text(text)
-        
-        if not chunks:
-            st.warning("PDF 내용을 처리할 수 없습니다.")
-            return None
-        
-        # 임베딩 생성 및 벡터 저장소 초기화 - 모델명 명시적으로 지정
-        embeddings = OllamaEmbeddings(model="llama3.2", base_url=OLLAMA_BASE_URL)
-        vectorstore = FAISS.from_texts(chunks, embeddings)
-        
-        return vectorstore
-    
-    except Exception as e:
-        st.error(f"PDF 처리 중 오류 발생: {e}")
-        return None
+# PDF 인덱싱 작업 시작 함수
+def start_pdf_ingestion(document):
+    """PDF 인덱싱을 백그라운드에서 시작합니다. 캐시에 인덱스가 있으면 완료된 작업을 바로 반환합니다."""
+    # 텍스트 추출 백엔드 (문서에 지정되지 않으면 PDF_TEXT_BACKEND 환경 변수 사용)
+    extractor = get_backend(document.extractor_name)
+    
+    # 임베딩 모델 - 모델명 명시적으로 지정 (배치 단위 병렬 요청)
+    # 이전에 임베딩한 적 있는 청크는 청크 임베딩 저장소에서 재사용
+    embed_model = "llama3.2"
+    embeddings = CachedEmbeddings(
+        BatchedOllamaEmbeddings(model=embed_model, base_url=OLLAMA_BASE_URL),
+        model=embed_model
+    )
+    
+    # 동일한 PDF와 설정으로 만든 인덱스가 디스크 캐시에 있으면 바로 불러오기
+    index_cache = get_index_cache()
+    cache_key = make_index_key(
+        document.sha256, embed_model, PDF_CHUNK_SIZE, PDF_CHUNK_OVERLAP,
+        extractor=extractor.name, index_type=FAISS_INDEX_TYPE
+    )
+    vectorstore = index_cache.load(cache_key, embeddings)
+    if vectorstore is not None:
+        return IngestionJob.completed(vectorstore, embeddings, document)
+    
+    # 인덱싱이 끝나면 디스크 캐시에 저장 (백그라운드 스레드에서 호출되므로 st 호출 금지)
+    def save_to_cache(job):
+        try:
+            index_cache.save(
+                cache_key,
+                job.vectorstore,
+                meta={
+                    "file_name": document.name,
+                    "pages": job.total_pages,
+                    "chunks": job.indexed_chunks,
+                    "embedding_hits": embeddings.hits,
+                    "embedding_misses": embeddings.misses,
+                    "index": job.index_report._asdict() if job.index_report else None,
+                }
+            )
+        except Exception:
+            # 캐시 저장 실패는 인덱스 사용에 영향을 주지 않음
+            pass
+    
+    job = IngestionJob(
+        document,
+        embeddings,
+        extractor_name=extractor.name,
+        chunk_size=PDF_CHUNK_SIZE,
+        chunk_overlap=PDF_CHUNK_OVERLAP,
+        on_complete=save_to_cache
+    )
+    return job.start()
+
+# 벡터 인덱스 설명 (인덱싱 직후면 평면 인덱스 대비 재현율과 질의 지연 포함)
+def describe_vector_index(job):
+    report = job.index_report
+    if report is None:
+        index = job.vectorstore.index
+        return f"벡터 인덱스: {index_type_of(index)} ({index.ntotal}개 벡터)"
+    return (
+        f"벡터 인덱스: {report.index_type} ({report.vectors}개 벡터) · "
+        f"재현율@{BENCHMARK_K} {report.recall:.0%} · "
+        f"질의당 {report.latency_ms:.2f}ms (평면 인덱스 {report.flat_latency_ms:.2f}ms)"
+    )
 
 # 챗봇 초기화 함수
-def initialize_chatbot(vectorstore=None):
-    """챗봇을 초기화합니다. vectorstore가 제공되면 RAG 기반 챗봇을, 아니면 일반 챗봇을 반환합니다."""
+def initialize_chatbot(vectorstore=None, retriever=None):
+    """챗봇을 초기화합니다. vectorstore나 retriever가 제공되면 RAG 기반 챗봇을, 아니면 일반 챗봇을 반환합니다."""
     try:
         # 명시적으로 llama3.2 모델 사용
         llm = get_ollama_llm("llama3.2")
@@ -1071,11 +1113,21 @@ def initialize_chatbot(vectorstore=None):
             st.error("LLM을 초기화할 수 없습니다.")
             return None
         
-        if vectorstore:
+        if vectorstore or retriever:
             # RAG 기반 챗봇 설정
-            memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True
+            # 대화 기록은 모델 컨텍스트에서 검색 청크와 생성 토큰을 뺀 예산 안에서만 유지
+            # (최근 대화는 그대로, 오래된 대화는 백그라운드에서 요약)
+            memory = ConversationBudgetMemory(
+                conversation=ConversationBudget(
+                    llm=llm,
+                    budget_tokens=history_budget_tokens(
+                        llm.num_ctx, llm.num_predict,
+                        retrieval_context_tokens(
+                            PDF_RETRIEVAL_K, PDF_CHUNK_SIZE, history_chars=0, max_context_tokens=PDF_PACK_TOKENS
+                        )
+                    ),
+                    session_id=st.session_state.id
+                )
             )
             
             # 프롬프트 템플릿 설정
@@ -1094,11 +1146,21 @@ def initialize_chatbot(vectorstore=None):
                 input_variables=["context", "question"]
             )
             
+            # 답변 생성 LLM에만 태그를 붙여 질문 재구성 토큰은 스트리밍하지 않음
+            answer_llm = get_ollama_llm("llama3.2")
+            answer_llm.tags = [ANSWER_STREAM_TAG]
+            
             # 대화형 검색 체인 생성
+            # 검색된 청크는 겹치는 부분을 합치고 중복 문장을 지운 뒤 토큰 예산 안에서만 프롬프트에 넣음
             chain = ConversationalRetrievalChain.from_llm(
-                llm=llm,
-                retriever=vectorstore.as_retriever(),
+                llm=answer_llm,
+                condense_question_llm=llm,
+                retriever=PackingRetriever(
+                    retriever=retriever or HybridRetriever.from_vectorstore(vectorstore, k=PDF_RETRIEVAL_K),
+                    max_tokens=PDF_PACK_TOKENS
+                ),
                 memory=memory,
+                return_source_documents=True,
                 combine_docs_chain_kwargs={"prompt": PROMPT}
             )
             
@@ -1113,66 +1175,18 @@ def initialize_chatbot(vectorstore=None):
 
 # Ollama 서버 상태 확인
 def check_ollama_server():
-    """Ollama 서버가 실행 중인지 확인합니다."""
-    try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags")
-        return response.status_code == 200
-    except:
-        return False
+    """Ollama 서버가 실행 중인지 확인합니다 (세션 간 공유되는 캐시된 상태)."""
+    return get_model_catalog(OLLAMA_BASE_URL).is_healthy()
 
 # Ollama 모델 실행 함수
 def run_ollama_model(model_name="llama3.2:latest"):
-    """지정된 Ollama 모델을 실행합니다."""
+    """지정된 Ollama 모델을 API로 메모리에 올립니다 (keep_alive 동안 유지)."""
+    manager = get_model_manager(OLLAMA_BASE_URL)
     try:
-        # 운영체제 확인
-        system = platform.system()
-        
-        command = ["ollama", "run", model_name]
-        
-        # 명령어 실행 중임을 표시
-        st.info(f"'{' '.join(command)}' 명령어를 실행 중입니다...")
-        
-        if system == "Darwin" or system == "Linux":  # macOS 또는 Linux
-            # 백그라운드에서 Ollama 모델 실행
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # 잠시 대기
-            time.sleep(2)
-            
-            # 프로세스가 실행 중인지 확인
-            if process.poll() is None:
-                return True, f"{model_name} 모델이 성공적으로 로드되었습니다."
-            else:
-                stderr = process.stderr.read()
-                return False, f"모델 로드 실패: {stderr}"
-                
-        elif system == "Windows":
-            # Windows에서 Ollama 모델 실행
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-            
-            # 잠시 대기
-            time.sleep(2)
-            
-            # 프로세스가 실행 중인지 확인
-            if process.poll() is None:
-                return True, f"{model_name} 모델이 성공적으로 로드되었습니다."
-            else:
-                stderr = process.stderr.read()
-                return False, f"모델 로드 실패: {stderr}"
-        else:
-            return False, f"지원되지 않는 운영체제: {system}"
-            
+        if manager.is_resident(model_name):
+            return True, f"{model_name} 모델이 이미 로드되어 있습니다."
+        manager.ensure_loaded(model_name)
+        return True, f"{model_name} 모델이 성공적으로 로드되었습니다."
     except Exception as e:
         return False, f"Ollama 모델 실행 중 오류 발생: {e}"
 
@@ -1187,11 +1201,16 @@ def render_pdf_chatbot():
         return
     
     # 모델 가용성 확인
+    catalog = get_model_catalog(OLLAMA_BASE_URL)
     try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags")
-        available_models = [model["name"] for model in response.json()["models"]]
+        available_models = catalog.model_names()
         
-        if "llama3.2" not in available_models and "llama3.2:latest" not in available_models:
+        if catalog.has_model("llama3.2"):
+            # 추론 옵션(num_ctx 등)을 먼저 정해 추론 프로필용 생성 속도 측정을 시작하고,
+            # 첫 질문에서 모델 로딩을 기다리지 않도록 같은 옵션으로 미리 올려 둠
+            get_llm_options("llama3.2")
+            get_model_manager(OLLAMA_BASE_URL).warm_up("llama3.2")
+        else:
             st.warning("llama3.2 모델이 설치되어 있지 않습니다. 터미널에서 'ollama pull llama3.2' 명령어를 실행하여 모델을 설치하세요.")
             st.info(f"사용 가능한 모델: {', '.join(available_models)}")
     except Exception as e:
@@ -1210,6 +1229,22 @@ def render_pdf_chatbot():
         
         # 모델 정보 표시
         st.info(f"현재 사용 중인 모델: llama3.2:latest")
+        model_info = catalog.get("llama3.2")
+        if model_info is not None:
+            st.caption(
+                f"{model_info.parameter_size or '?'} · {model_info.quantization or '?'} · "
+                f"컨텍스트 {model_info.context_length or '?'} 토큰 · "
+                f"{(model_info.size or 0) / (1024 ** 3):.1f}GB"
+            )
+        
+        # 여러 Ollama 서버를 사용하는 경우 서버별 상태 표시
+        ollama_client = get_ollama_client(OLLAMA_BASE_URL)
+        if isinstance(ollama_client, OllamaRouter):
+            for endpoint in ollama_client.stats():
+                st.caption(
+                    f"{'🟢' if endpoint['healthy'] else '🔴'} {endpoint['base_url']} · "
+                    f"진행 중 {endpoint['in_flight']}건 · {', '.join(endpoint['loaded']) or '로드된 모델 없음'}"
+                )
         st.markdown("""
         <div style="background-color: #f0f7ff; padding: 10px; border-radius: 5px; margin-bottom: 15px;">
             <p style="margin: 0; font-size: 0.9rem;">
@@ -1225,25 +1260,61 @@ def render_pdf_chatbot():
         st.subheader("PDF 업로드")
         uploaded_file = st.file_uploader("PDF 파일을 업로드하세요", type="pdf")
         
+        # 텍스트 추출 엔진 선택 (기본값은 배포 설정)
+        extractor_options = ["auto"] + list(EXTRACTION_BACKENDS)
+        extractor_name = st.selectbox(
+            "텍스트 추출 엔진",
+            extractor_options,
+            index=extractor_options.index(PDF_TEXT_BACKEND) if PDF_TEXT_BACKEND in extractor_options else 0,
+            help="pymupdf는 대체로 더 빠르고, pypdf는 추가 의존성이 없습니다. python pdf_extract.py <폴더> 로 비교할 수 있습니다."
+        )
+        
         # 챗봇 초기화 상태
         if "chatbot" not in st.session_state:
             st.session_state.chatbot = None
-            st.session_state.vectorstore = None
+            st.session_state.ingestion = None
         
         if uploaded_file is not None:
-            # PDF 파일 처리
-            if "pdf_processed" not in st.session_state or st.session_state.pdf_processed != uploaded_file.name:
-                with st.spinner("PDF를 처리 중입니다..."):
-                    # PDF 처리 및 벡터 저장소 생성
-                    vectorstore = process_pdf(uploaded_file)
-                    
-                    if vectorstore:
-                        st.session_state.vectorstore = vectorstore
-                        st.session_state.chatbot = initialize_chatbot(vectorstore)
-                        st.session_state.pdf_processed = uploaded_file.name
-                        st.success("PDF 처리가 완료되었습니다!")
-                    else:
-                        st.error("PDF 처리 중 오류가 발생했습니다.")
+            # 업로드당 한 번만 만드는 문서 객체 (미리보기, 텍스트 추출, 다운로드가 공유)
+            document = get_upload_document(uploaded_file, st.session_state, extractor_name)
+            
+            # PDF 파일 처리 - 백그라운드에서 인덱싱하고, 인덱싱된 페이지부터 바로 질문 가능
+            # 같은 파일이라도 텍스트 추출 엔진을 바꾸면 다시 인덱싱 (인덱스 캐시 키에도 엔진이 포함됨)
+            processed_key = (document.sha256, get_backend(extractor_name).name)
+            if st.session_state.get("pdf_processed") != processed_key:
+                try:
+                    # 인덱싱 스레드가 이 세션의 요청으로 스케줄링되도록 세션 정보를 넘김
+                    with request_context(session_id=st.session_state.id):
+                        ingestion = start_pdf_ingestion(document)
+                    st.session_state.ingestion = ingestion
+                    st.session_state.chatbot = initialize_chatbot(
+                        retriever=ingestion.as_retriever(search_kwargs={"k": PDF_RETRIEVAL_K})
+                    )
+                    st.session_state.pdf_processed = processed_key
+                except Exception as e:
+                    st.error(f"PDF 처리 중 오류 발생: {e}")
+            
+            # 인덱싱 진행 상황 표시
+            ingestion = st.session_state.ingestion
+            if ingestion is not None:
+                indexed_pages, total_pages = ingestion.progress()
+                if ingestion.error is not None:
+                    st.error(f"PDF 처리 중 오류 발생: {ingestion.error}")
+                elif not ingestion.done:
+                    st.progress(
+                        indexed_pages / total_pages if total_pages else 0.0,
+                        text=f"인덱싱 중: {indexed_pages}/{total_pages} 페이지 (인덱싱된 페이지부터 질문할 수 있습니다)"
+                    )
+                    st.button("진행 상황 새로고침", key="refresh_ingestion")
+                elif ingestion.vectorstore is None:
+                    st.warning("PDF에서 텍스트를 추출할 수 없습니다.")
+                else:
+                    st.success("PDF 처리가 완료되었습니다!")
+                    st.caption(
+                        f"임베딩 캐시: {ingestion.embeddings.hits}개 재사용, "
+                        f"{ingestion.embeddings.misses}개 새로 임베딩"
+                    )
+                    st.caption(describe_vector_index(ingestion))
             
             # 문서 교정 옵션
             st.subheader("문서 교정 옵션")
@@ -1270,8 +1341,8 @@ def render_pdf_chatbot():
                     st.success(f"문서 교정이 완료되었습니다! {errors_found}개의 오류를 발견하고 {corrections_made}개를 수정했습니다.")
         else:
             # PDF가 업로드되지 않은 경우 일반 챗봇 초기화
-            if st.session_state.chatbot is None or st.session_state.vectorstore is not None:
-                st.session_state.vectorstore = None
+            if st.session_state.chatbot is None or st.session_state.ingestion is not None:
+                st.session_state.ingestion = None
                 st.session_state.chatbot = initialize_chatbot()
                 st.session_state.pdf_processed = None
     
@@ -1279,7 +1350,7 @@ def render_pdf_chatbot():
     if uploaded_file is not None:
         # PDF 미리보기와 챗봇 영역 분리
         st.subheader("PDF 미리보기")
-        display_pdf(uploaded_file)
+        display_pdf(document)
         
         st.markdown("---")
     
@@ -1311,26 +1382,100 @@ def render_pdf_chatbot():
         
         # 챗봇 응답 생성
         with st.chat_message("assistant"):
-            with st.spinner("답변 생성 중..."):
-                if st.session_state.chatbot:
-                    try:
-                        if st.session_state.vectorstore:
-                            # RAG 기반 응답 생성
-                            response = st.session_state.chatbot({"question": prompt})
-                            response_text = response["answer"]
+            message_placeholder = st.empty()
+            message_placeholder.markdown("▌")
+            response_text = ""
+            
+            # 토큰을 일정 간격(STREAM_RENDER_INTERVAL_MS)으로 모아서 다시 그림
+            renderer = ThrottledMarkdown(message_placeholder)
+            
+            if st.session_state.chatbot:
+                timer = StreamTimer()
+                # 다른 세션의 요청으로 Ollama가 바쁘면 대기 순서를 표시
+                on_wait = queue_position_notifier(message_placeholder)
+                try:
+                    with request_context(
+                        session_id=st.session_state.id,
+                        priority=PRIORITY_INTERACTIVE,
+                        on_wait=on_wait
+                    ):
+                        semantic_hit = None
+                        use_semantic_cache = False
+                        plain_stream = None
+                        if st.session_state.ingestion:
+                            ingestion = st.session_state.ingestion
+                            chatbot = st.session_state.chatbot
+                            # 같은 문서에 대한 비슷한 질문의 답변이 있으면 검색과 생성을 건너뜀
+                            # 앞선 대화를 가리키는 후속 질문은 대화마다 뜻이 달라 세션 간에 공유하는 캐시를 쓰지 않음
+                            use_semantic_cache = not (
+                                has_anaphora(prompt) and chatbot.memory.conversation.history()
+                            )
+                            if use_semantic_cache:
+                                semantic_key = f"{ingestion.document.sha256}-llama3.2"
+                                question_vector = ingestion.embed_query(prompt)
+                                semantic_hit = get_semantic_answer_cache().lookup(semantic_key, question_vector)
+                            if semantic_hit is not None:
+                                tokens = [semantic_hit[0]]
+                                # 다음 질문의 재구성에 쓰이도록 대화 기록에는 남김
+                                chatbot.memory.save_context({"question": prompt}, {"answer": semantic_hit[0]})
+                            else:
+                                # RAG 기반 응답 생성 - 답변 LLM의 토큰을 생성되는 즉시 표시
+                                tokens = CallbackStream(
+                                    lambda callbacks: chatbot.invoke(
+                                        {"question": prompt}, config={"callbacks": callbacks}
+                                    ),
+                                    timer,
+                                    on_wait=on_wait
+                                )
                         else:
-                            # 일반 LLM 응답 생성
-                            response_text = st.session_state.chatbot.invoke(
-                                f"사용자 질문: {prompt}\n\n답변:"
+                            # 일반 LLM 응답 생성 - 토큰을 생성되는 즉시 표시
+                            # (같은 질문은 응답 캐시에서 바로 가져옴)
+                            plain_stream = CachedStream(
+                                st.session_state.chatbot, f"사용자 질문: {prompt}\n\n답변:"
                             )
-                    except Exception as e:
-                        st.error(f"응답 생성 중 오류 발생: {e}")
-                        response_text = "죄송합니다. 응답을 생성하는 중에 오류가 발생했습니다. 다시 시도해 주세요."
-                else:
-                    response_text = "챗봇이 초기화되지 않았습니다. 페이지를 새로고침하거나 다시 시도해 주세요."
-                
-                # 응답 표시
-                st.markdown(response_text)
+                            tokens = timed_tokens(plain_stream, timer)
+                        
+                        for token in tokens:
+                            renderer.append(token)
+                    response_text = renderer.text
+                    cache_hit = plain_stream is not None and plain_stream.hit
+                    
+                    # 캐시 등으로 토큰 없이 끝난 경우 최종 결과 사용
+                    if not response_text and isinstance(tokens, CallbackStream) and tokens.result:
+                        response_text = tokens.result["answer"]
+                        cache_hit = True
+                    
+                    # 인덱싱이 끝난 문서에서 새로 만든 답변만 의미 기반 캐시에 저장
+                    if use_semantic_cache and isinstance(tokens, CallbackStream) and response_text and ingestion.done:
+                        get_semantic_answer_cache().add(semantic_key, prompt, question_vector, response_text)
+                    
+                    renderer.finish(response_text)
+                    scheduler_stats = get_llm_scheduler().stats()
+                    cache_stats = get_response_cache().stats()
+                    if semantic_hit is not None:
+                        st.caption(f"💾 비슷한 질문(“{semantic_hit[1]}”, 유사도 {semantic_hit[2]:.2f})의 캐시된 답변입니다.")
+                    else:
+                        packing = None
+                        if isinstance(tokens, CallbackStream) and tokens.result:
+                            packing = packing_report(tokens.result.get("source_documents"))
+                        st.caption(
+                            f"{'⚡ 캐시된 응답 · ' if cache_hit else ''}{timer.summary()}"
+                            f" · 실행 중 {scheduler_stats['active']}/{scheduler_stats['max_concurrency']}"
+                            f" · 대기 {scheduler_stats['queued']}건"
+                            f" · 응답 캐시 적중률 {cache_stats['hit_rate']:.0%}"
+                            + (
+                                f" · 컨텍스트 {packing.packed_tokens}토큰"
+                                f" (청크 {packing.chunks_in}→{packing.chunks_out}개, {packing.tokens_saved}토큰 절약)"
+                                if packing else ""
+                            )
+                        )
+                except Exception as e:
+                    st.error(f"응답 생성 중 오류 발생: {e}")
+                    response_text = "죄송합니다. 응답을 생성하는 중에 오류가 발생했습니다. 다시 시도해 주세요."
+                    message_placeholder.markdown(response_text)
+            else:
+                response_text = "챗봇이 초기화되지 않았습니다. 페이지를 새로고침하거나 다시 시도해 주세요."
+                message_placeholder.markdown(response_text)
         
         # 챗봇 메시지 추가
         st.session_state.messages.append({"role": "assistant", "content": response_text})
@@ -1340,6 +1485,9 @@ def render_pdf_chatbot():
     with col1:
         if st.button("대화 초기화", key="reset_chat", use_container_width=True):
             st.session_state.messages = []
+            memory = getattr(st.session_state.get("chatbot"), "memory", None)
+            if memory is not None:
+                memory.clear()
             st.rerun()
 
 # JD/RFP 검색 및 AI 요약 기능
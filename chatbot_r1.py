@@ -3,14 +3,24 @@ from dotenv import load_dotenv
 load_dotenv()
 import streamlit as st
 import time
-import base64
 import uuid
-import tempfile
-import requests
-from langchain_community.embeddings import OllamaEmbeddings
+from index_registry import get_index_registry
+from pdf_document import get_upload_document
+from render_cache import get_page_render_cache
+from static_assets import get_static_asset_store
+from streaming import StreamTimer, ThrottledMarkdown, queue_position_notifier, stream_retrieval_chain
+from llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, request_context
+from ollama_embeddings import BatchedOllamaEmbeddings
+from embedding_store import CachedEmbeddings
+from ollama_client import PooledOllama
+from model_manager import get_model_manager
+from inference_profiles import inference_options, retrieval_context_tokens
+from query_rewrite import create_conditional_history_aware_retriever
+from conversation_memory import ConversationBudget, history_budget_tokens
+from context_packing import PackingRetriever, context_budget_tokens, packing_report
+from lexical_index import HybridRetriever
 from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.llms import Ollama
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.messages import HumanMessage, SystemMessage
 
 if "id" not in st.session_state:
@@ -21,29 +31,179 @@ session_id = st.session_state.id
 client = None
 
 # Ollama 서버 URL 설정 (기본값: localhost:11434)
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# OLLAMA_BASE_URLS에 쉼표로 여러 서버를 지정하면 서버 간 부하 분산·장애 조치
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 
 # Ollama 모델 설정
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "deepseek-r1")
 OLLAMA_CHAT_MODEL = os.getenv("OLLAMA_CHAT_MODEL", "deepseek-r1")
 
+# 문서 청크 크기와 질문마다 검색하는 청크 수 (LLM의 num_ctx 계산에도 사용됨)
+RAG_CHUNK_SIZE = 4000
+RAG_RETRIEVAL_K = 2
+# 검색 청크를 압축해 프롬프트에 넣는 토큰 예산 (압축과 num_ctx 계산에 같은 값을 사용)
+RAG_PACK_TOKENS = context_budget_tokens(RAG_RETRIEVAL_K, RAG_CHUNK_SIZE)
+# 채팅 모델의 예상 입력 토큰 수 (모델별 num_ctx는 이 값으로 한 번만 정하고 모든 호출에서 같은 값을 사용)
+RAG_CONTEXT_TOKENS = retrieval_context_tokens(RAG_RETRIEVAL_K, RAG_CHUNK_SIZE, max_context_tokens=RAG_PACK_TOKENS)
+
+# PDF 미리보기에서 한 번에 렌더링하는 페이지 수와 기본 배율
+PREVIEW_WINDOW_PAGES = int(os.environ.get("PREVIEW_WINDOW_PAGES", "3"))
+PREVIEW_ZOOM = 1.2
+
+# 채팅 모델의 num_ctx·num_thread를 먼저 정하고(추론 프로필용 생성 속도 측정도 시작),
+# 첫 질문에서 모델 로딩을 기다리지 않도록 같은 옵션으로 미리 올려 둠 (이미 상주 중이면 무시)
+inference_options(OLLAMA_BASE_URL, OLLAMA_CHAT_MODEL, RAG_CONTEXT_TOKENS)
+get_model_manager(OLLAMA_BASE_URL).warm_up(OLLAMA_CHAT_MODEL)
+
 def reset_chat():
     st.session_state.messages = []
     st.session_state.context = None
+    if "conversation" in st.session_state:
+        st.session_state.conversation.clear()
+
+# 세션의 대화 기록 (모델 컨텍스트에 맞춘 토큰 예산 안에서 최근 대화는 그대로, 오래된 대화는 요약)
+def initialize_conversation():
+    if "conversation" not in st.session_state:
+        options = inference_options(OLLAMA_BASE_URL, OLLAMA_CHAT_MODEL, RAG_CONTEXT_TOKENS)
+        st.session_state.conversation = ConversationBudget(
+            llm=PooledOllama(base_url=OLLAMA_BASE_URL, model=OLLAMA_CHAT_MODEL, **options),
+            budget_tokens=history_budget_tokens(
+                options["num_ctx"], options["num_predict"],
+                retrieval_context_tokens(
+                    RAG_RETRIEVAL_K, RAG_CHUNK_SIZE, history_chars=0, max_context_tokens=RAG_PACK_TOKENS
+                )
+            ),
+            session_id=session_id
+        )
+    return st.session_state.conversation
+
+def display_pdf(document):
+    # Streamlit static serving only sends images with a proper content type,
+    # so the PDF itself goes through the download button and pages are previewed as PNGs
+    st.download_button("Download PDF", data=document.raw, file_name=document.name, mime="application/pdf")
+
+    try:
+        total_pages = document.page_count
+        if total_pages == 0:
+            st.warning("The PDF has no pages.")
+            return
+
+        # Only the selected window of pages is rendered
+        col_page, col_zoom = st.columns([2, 1])
+        with col_page:
+            start_page = st.number_input(
+                "Preview from page",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                step=PREVIEW_WINDOW_PAGES,
+                key=f"preview_page_{document.sha256}"
+            )
+        with col_zoom:
+            zoom = st.select_slider("Zoom", options=[0.8, 1.0, 1.2, 1.5, 2.0], value=PREVIEW_ZOOM, key="preview_zoom")
+        end_page = min(start_page + PREVIEW_WINDOW_PAGES - 1, total_pages)
+        st.markdown(f"### PDF Preview (pages {start_page}-{end_page} of {total_pages})")
+
+        render_cache = get_page_render_cache()
+        asset_store = get_static_asset_store()
+        with st.container(height=700, border=True):
+            for page_num in range(start_page - 1, end_page):
+                image_url = asset_store.page_image_url(document, page_num, zoom, render_cache)
+                st.markdown(
+                    f'<p style="text-align:center; color:#555; font-size:0.9rem;">Page {page_num + 1}/{total_pages}</p>'
+                    f'<img src="{image_url}" loading="lazy" style="width:100%">',
+                    unsafe_allow_html=True
+                )
+    except Exception as e:
+        st.error(f"Could not render the PDF preview: {e}")
+
+# 업로드된 PDF 인덱싱 및 RAG 체인 생성 (인덱스 레지스트리에 없을 때만 호출됨)
+def build_rag_index(document):
+    st.write("Indexing your document...")
+
+    # 임시 파일 없이 문서 객체의 페이지 텍스트를 바로 사용 (PyPDFLoader.load_and_split과 같은 분할)
+    # 청크 위치(start_index)는 검색 후 겹치는 청크를 합칠 때 사용
+    pages = RecursiveCharacterTextSplitter(
+        chunk_size=RAG_CHUNK_SIZE, add_start_index=True
+    ).split_documents(document.to_documents())
+    
+    # Ollama 임베딩 모델 사용 (배치 단위 병렬 요청, 이미 본 청크는 저장소에서 재사용)
+    embeddings = CachedEmbeddings(
+        BatchedOllamaEmbeddings(
+            base_url=OLLAMA_BASE_URL,
+            model=OLLAMA_EMBED_MODEL
+        ),
+        model=OLLAMA_EMBED_MODEL
+    )
+
+    # FAISS 벡터 저장소 생성 (Chroma 대신 사용)
+    vectorstore = FAISS.from_documents(
+        documents=pages,
+        embedding=embeddings
+    )
+    st.caption(f"Embedding cache: {embeddings.hits} hits / {embeddings.misses} misses")
+
+    # 검색기 설정 (벡터 검색과 청크 BM25 역색인 검색을 RRF로 합침)
+    retriever = HybridRetriever.from_vectorstore(vectorstore, k=RAG_RETRIEVAL_K)
 
-def display_pdf(file):
-    # Opening file from file path
-    st.markdown("### PDF Preview")
-    base64_pdf = base64.b64encode(file.read()).decode("utf-8")
+    # Ollama LLM 설정 (공유 연결 풀 사용, 호스트 성능과 검색 컨텍스트 크기에 맞춘 추론 프로필 적용)
+    llm = PooledOllama(
+        base_url=OLLAMA_BASE_URL,
+        model=OLLAMA_CHAT_MODEL,
+        **inference_options(OLLAMA_BASE_URL, OLLAMA_CHAT_MODEL, RAG_CONTEXT_TOKENS)
+    )
 
-    # Embedding PDF in HTML
-    pdf_display = f"""<iframe src="data:application/pdf;base64,{base64_pdf}" width="400" height="100%" type="application/pdf"
-                        style="height:100vh; width:100%"
-                    >
-                    </iframe>"""
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-    # Displaying File
-    st.markdown(pdf_display, unsafe_allow_html=True)
+    # 컨텍스트화 프롬프트 설정
+    contextualize_q_system_prompt = """이전 대화 내용과 최신 사용자 질문이 있을 때, 이 질문이 이전 대화 내용과 관련이 있을 수 있습니다. 
+    이런 경우, 대화 내용을 알 필요 없이 독립적으로 이해할 수 있는 질문으로 바꾸세요. 
+    질문에 답할 필요는 없고, 필요하다면 그저 다시 구성하거나 그대로 두세요."""
+
+    contextualize_q_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", contextualize_q_system_prompt),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ]
+    )
+
+    # 대화 기록을 인식하는 검색기 생성 (지시어가 있는 후속 질문만 LLM으로 재구성)
+    # 검색된 청크는 겹치는 부분을 합치고 중복 문장을 지운 뒤 토큰 예산 안에서만 프롬프트에 넣음
+    history_aware_retriever = create_conditional_history_aware_retriever(
+        llm, PackingRetriever(retriever=retriever, max_tokens=RAG_PACK_TOKENS), contextualize_q_prompt
+    )
+
+    from langchain.chains import create_retrieval_chain
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+
+    # 질문-답변 프롬프트 설정
+    qa_system_prompt = """질문-답변 업무를 돕는 보조원입니다. 
+    질문에 답하기 위해 검색된 내용을 사용하세요. 
+    답을 모르면 모른다고 말하세요. 
+    답변은 세 문장 이내로 간결하게 유지하세요.
+
+    ## 답변 예시
+    📍답변 내용: 
+    📍증거: 
+
+    {context}"""
+
+    qa_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", qa_system_prompt),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ]
+    )
+
+    # 문서 체인 생성
+    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+
+    # 최종 RAG 체인 생성
+    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+
+    return {"retriever": retriever, "rag_chain": rag_chain}
 
 with st.sidebar:
     st.header(f"Add your documents!")
@@ -52,102 +212,26 @@ with st.sidebar:
 
     if uploaded_file:
         try:
-            file_key = f"{session_id}-{uploaded_file.name}"
-
-            with tempfile.TemporaryDirectory() as temp_dir:
-                file_path = os.path.join(temp_dir, uploaded_file.name)
-                
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getvalue())
-                
-                file_key = f"{session_id}-{uploaded_file.name}"
-                st.write("Indexing your document...")
-
-                if file_key not in st.session_state.get('file_cache', {}):
-                    if os.path.exists(temp_dir):
-                        loader = PyPDFLoader(file_path)
-                    else:    
-                        st.error('Could not find the file you uploaded, please check again...')
-                        st.stop()
-                    
-                    pages = loader.load_and_split()
-                    
-                    # Ollama 임베딩 모델 사용
-                    embeddings = OllamaEmbeddings(
-                        base_url=OLLAMA_BASE_URL,
-                        model=OLLAMA_EMBED_MODEL
-                    )
-                    
-                    # FAISS 벡터 저장소 생성 (Chroma 대신 사용)
-                    vectorstore = FAISS.from_documents(
-                        documents=pages,
-                        embedding=embeddings
-                    )
-                    
-                    # 검색기 설정
-                    retriever = vectorstore.as_retriever(search_kwargs={"k": 2})
-                    
-                    # Ollama LLM 설정
-                    llm = Ollama(
-                        base_url=OLLAMA_BASE_URL,
-                        model=OLLAMA_CHAT_MODEL
-                    )
-                    
-                    from langchain.chains import create_history_aware_retriever
-                    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-
-                    # 컨텍스트화 프롬프트 설정
-                    contextualize_q_system_prompt = """이전 대화 내용과 최신 사용자 질문이 있을 때, 이 질문이 이전 대화 내용과 관련이 있을 수 있습니다. 
-                    이런 경우, 대화 내용을 알 필요 없이 독립적으로 이해할 수 있는 질문으로 바꾸세요. 
-                    질문에 답할 필요는 없고, 필요하다면 그저 다시 구성하거나 그대로 두세요."""
-
-                    contextualize_q_prompt = ChatPromptTemplate.from_messages(
-                        [
-                            ("system", contextualize_q_system_prompt),
-                            MessagesPlaceholder("chat_history"),
-                            ("human", "{input}"),
-                        ]
-                    )
-
-                    # 대화 기록을 인식하는 검색기 생성
-                    history_aware_retriever = create_history_aware_retriever(
-                        llm, retriever, contextualize_q_prompt
-                    )
-
-                    from langchain.chains import create_retrieval_chain
-                    from langchain.chains.combine_documents import create_stuff_documents_chain
-
-                    # 질문-답변 프롬프트 설정
-                    qa_system_prompt = """질문-답변 업무를 돕는 보조원입니다. 
-                    질문에 답하기 위해 검색된 내용을 사용하세요. 
-                    답을 모르면 모른다고 말하세요. 
-                    답변은 세 문장 이내로 간결하게 유지하세요.
-
-                    ## 답변 예시
-                    📍답변 내용: 
-                    📍증거: 
-
-                    {context}"""
-                    
-                    qa_prompt = ChatPromptTemplate.from_messages(
-                        [
-                            ("system", qa_system_prompt),
-                            MessagesPlaceholder("chat_history"),
-                            ("human", "{input}"),
-                        ]
-                    )
-
-                    # 문서 체인 생성
-                    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-
-                    # 최종 RAG 체인 생성
-                    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
-                    
-                    # 세션 상태에 체인 저장
-                    st.session_state.rag_chain = rag_chain
-
-                st.success("Ready to Chat!")
-                display_pdf(uploaded_file)
+            # 업로드당 한 번만 만드는 문서 객체 (미리보기, 텍스트 추출이 공유)
+            document = get_upload_document(uploaded_file, st.session_state)
+            doc_hash = document.sha256
+            file_key = f"{session_id}-{doc_hash}"
+
+            # 같은 문서는 세션과 재실행에 관계없이 한 번만 인덱싱
+            registry_key = f"chatbot_r1-{OLLAMA_EMBED_MODEL}-{OLLAMA_CHAT_MODEL}-{doc_hash}"
+            # 인덱싱 임베딩 요청은 다른 사용자의 대화보다 낮은 우선순위로 처리
+            with request_context(session_id, PRIORITY_BACKGROUND):
+                index_entry = get_index_registry().get_or_build(
+                    registry_key,
+                    lambda: build_rag_index(document)
+                )
+
+            # 세션 상태에 체인 저장
+            st.session_state.file_cache[file_key] = registry_key
+            st.session_state.rag_chain = index_entry["rag_chain"]
+
+            st.success("Ready to Chat!")
+            display_pdf(document)
         except Exception as e:
             st.error(f"An error occurred: {e}")
             st.stop()     
@@ -163,19 +247,13 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
         
-# 프롬프트 비용이 너무 많이 소요되는 것을 방지하기 위해
-MAX_MESSAGES_BEFORE_DELETION = 4
+# 프롬프트 비용이 대화 길이에 따라 늘지 않도록 토큰 예산 안의 대화 기록만 모델에 보냄
+conversation = initialize_conversation()
 
 # 웹사이트에서 유저의 인풋을 받고 위에서 만든 AI 에이전트 실행시켜서 답변 받기
 if prompt := st.chat_input("Ask a question!"):
     
     # 유저가 보낸 질문이면 유저 아이콘과 질문 보여주기
-    # 만약 현재 저장된 대화 내용 기록이 4개보다 많으면 자르기
-    if len(st.session_state.messages) >= MAX_MESSAGES_BEFORE_DELETION:
-        # Remove the first two messages
-        del st.session_state.messages[0]
-        del st.session_state.messages[0]  
-   
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -186,19 +264,35 @@ if prompt := st.chat_input("Ask a question!"):
         full_response = ""
         
         if "rag_chain" in st.session_state:
-            # RAG 체인 사용
-            result = st.session_state.rag_chain.invoke({"input": prompt, "chat_history": st.session_state.messages})
+            # RAG 체인 사용 - 생성되는 토큰을 바로 표시
+            timer = StreamTimer()
+            # 토큰은 일정 간격으로 모아서 그려 렌더링 비용을 제한
+            renderer = ThrottledMarkdown(message_placeholder)
+            context = None
+            # 다른 세션의 요청으로 Ollama가 바쁘면 대기 순서를 표시
+            with request_context(session_id, PRIORITY_INTERACTIVE):
+                for kind, value in stream_retrieval_chain(
+                    st.session_state.rag_chain,
+                    {"input": prompt, "chat_history": conversation.history()},
+                    timer,
+                    on_wait=queue_position_notifier(message_placeholder)
+                ):
+                    if kind == "context":
+                        context = value
+                    else:
+                        renderer.append(value)
+            full_response = renderer.finish()
+            packing = packing_report(context)
+            st.caption(
+                timer.summary()
+                + (f" · context {packing.packed_tokens} tokens ({packing.tokens_saved} saved)" if packing else "")
+            )
+            # 예산을 넘으면 오래된 대화는 백그라운드에서 요약
+            conversation.add_turn(prompt, full_response)
 
             # 증거자료 보여주기
             with st.expander("Evidence context"):
-                st.write(result["context"])
-
-            # 답변 표시 (스트리밍 효과)
-            for chunk in result["answer"].split(" "):
-                full_response += chunk + " "
-                time.sleep(0.05)  # 스트리밍 속도 조정 (Ollama가 더 빠를 수 있음)
-                message_placeholder.markdown(full_response + "▌")
-                message_placeholder.markdown(full_response)
+                st.write(context)
         else:
             # 문서가 로드되지 않은 경우
             full_response = "먼저 PDF 문서를 업로드해주세요."
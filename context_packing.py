@@ -0,0 +1,216 @@
+import os
+import re
+from collections import namedtuple
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from inference_profiles import CHARS_PER_TOKEN, estimate_tokens
+
+# 검색된 청크를 프롬프트에 넣을 때의 토큰 상한
+CONTEXT_PACK_MAX_TOKENS = int(os.environ.get("CONTEXT_PACK_MAX_TOKENS", "2048"))
+# start_index가 없는 청크끼리 겹친다고 볼 최소 글자 수
+MIN_OVERLAP_CHARS = 30
+# 이보다 짧은 문장(목록 기호, 머리글 등)은 중복이어도 지우지 않음
+MIN_DEDUP_SENTENCE_CHARS = 15
+# 예산이 이 토큰 수 이상 남아 있을 때만 넘치는 구간을 문장 단위로 잘라서 넣음
+MIN_PARTIAL_TOKENS = 64
+
+# 문장 경계 (마침표·물음표·느낌표 뒤 공백, 또는 줄바꿈). 구분자도 함께 남겨 원래 모양을 유지
+_SENTENCE_SPLIT_RE = re.compile(r"((?<=[.!?。])\s+|\n+)")
+
+PackingReport = namedtuple(
+    "PackingReport",
+    ["chunks_in", "chunks_out", "input_tokens", "packed_tokens", "tokens_saved"]
+)
+
+
+class _Segment:
+    """같은 페이지에서 이어 붙인 청크 구간입니다 (rank는 포함된 청크 중 가장 높은 검색 순위)."""
+
+    def __init__(self, rank, document):
+        self.rank = rank
+        self.metadata = dict(document.metadata)
+        self.text = document.page_content
+        self.start = document.metadata.get("start_index")
+        self.end = None if self.start is None else self.start + len(self.text)
+        self.chunks = 1
+
+    def absorb(self, other, overlap):
+        self.text = self.text + other.text[overlap:]
+        if self.end is not None and other.end is not None:
+            self.end = max(self.end, other.end)
+        self.rank = min(self.rank, other.rank)
+        self.chunks += other.chunks
+
+
+def _suffix_prefix_overlap(left, right, min_chars=MIN_OVERLAP_CHARS):
+    """left의 끝과 right의 앞이 겹치는 글자 수를 반환합니다 (min_chars 미만이면 0)."""
+    if len(left) < min_chars or len(right) < min_chars:
+        return 0
+    probe = right[:min_chars]
+    index = left.find(probe, max(0, len(left) - len(right)))
+    while index != -1:
+        if right.startswith(left[index:]):
+            return len(left) - index
+        index = left.find(probe, index + 1)
+    return 0
+
+
+def _merge_by_offset(segments):
+    """start_index가 있는 청크를 위치 순으로 정렬해 겹치거나 맞닿은 것끼리 합칩니다."""
+    merged = []
+    for segment in sorted(segments, key=lambda s: s.start):
+        previous = merged[-1] if merged else None
+        if previous is not None and segment.start <= previous.end:
+            overlap = previous.end - segment.start
+            if segment.end <= previous.end:
+                previous.rank = min(previous.rank, segment.rank)
+                previous.chunks += segment.chunks
+                continue
+            if previous.text.endswith(segment.text[:overlap]):
+                previous.absorb(segment, overlap)
+                continue
+        merged.append(segment)
+    return merged
+
+
+def _merge_by_text(segments):
+    """위치 정보가 없는 청크는 한쪽 끝과 다른 쪽 앞이 겹치면 합칩니다."""
+    segments = list(segments)
+    merged = True
+    while merged:
+        merged = False
+        for i, left in enumerate(segments):
+            for j, right in enumerate(segments):
+                if i == j:
+                    continue
+                if right.text in left.text:
+                    overlap = len(right.text)
+                    left.rank = min(left.rank, right.rank)
+                    left.chunks += right.chunks
+                else:
+                    overlap = _suffix_prefix_overlap(left.text, right.text)
+                    if not overlap:
+                        continue
+                    left.absorb(right, overlap)
+                del segments[j]
+                merged = True
+                break
+            if merged:
+                break
+    return segments
+
+
+def _dedupe_sentences(segments):
+    """순위가 높은 구간에 이미 나온 문장은 뒤 구간에서 지웁니다."""
+    seen = set()
+    for segment in segments:
+        parts = _SENTENCE_SPLIT_RE.split(segment.text)
+        kept = []
+        for index in range(0, len(parts), 2):
+            sentence = parts[index]
+            separator = parts[index + 1] if index + 1 < len(parts) else ""
+            key = " ".join(sentence.split())
+            if len(key) >= MIN_DEDUP_SENTENCE_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(sentence + separator)
+        segment.text = "".join(kept).strip()
+
+
+def _truncate_to_tokens(text, max_tokens):
+    """토큰 예산에 맞게 자르되, 가능하면 문장 경계에서 자릅니다."""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip()
+
+
+def pack_documents(documents, max_tokens=CONTEXT_PACK_MAX_TOKENS):
+    """검색 순위대로 받은 청크를 합치고 중복 문장을 지운 뒤 토큰 예산 안에서 순위대로 담습니다.
+
+    (압축한 Document 목록, PackingReport)를 반환합니다.
+    """
+    input_tokens = sum(estimate_tokens(doc.page_content) for doc in documents)
+
+    # 같은 문서의 같은 페이지끼리 묶어서 합침
+    groups = {}
+    for rank, document in enumerate(documents):
+        key = (document.metadata.get("source"), document.metadata.get("page"))
+        groups.setdefault(key, []).append(_Segment(rank, document))
+
+    segments = []
+    for group in groups.values():
+        with_offset = [s for s in group if s.start is not None]
+        without_offset = [s for s in group if s.start is None]
+        segments.extend(_merge_by_offset(with_offset) if with_offset else [])
+        segments.extend(_merge_by_text(without_offset))
+    segments.sort(key=lambda s: s.rank)
+    _dedupe_sentences(segments)
+
+    packed = []
+    remaining = max_tokens
+    for segment in segments:
+        if not segment.text:
+            continue
+        tokens = estimate_tokens(segment.text)
+        if tokens > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                break
+            segment.text = _truncate_to_tokens(segment.text, remaining)
+            tokens = estimate_tokens(segment.text)
+        metadata = dict(segment.metadata, merged_chunks=segment.chunks)
+        if segment.start is not None:
+            metadata["start_index"] = segment.start
+        packed.append(Document(page_content=segment.text, metadata=metadata))
+        remaining -= tokens
+        if remaining < MIN_PARTIAL_TOKENS:
+            break
+
+    packed_tokens = sum(estimate_tokens(doc.page_content) for doc in packed)
+    report = PackingReport(
+        len(documents), len(packed), input_tokens, packed_tokens, max(0, input_tokens - packed_tokens)
+    )
+    return packed, report
+
+
+def context_budget_tokens(k, chunk_size, max_tokens=CONTEXT_PACK_MAX_TOKENS):
+    """청크 k개를 검색해 압축할 때의 토큰 예산입니다.
+
+    PackingRetriever의 max_tokens와 num_ctx 계산(retrieval_context_tokens의 max_context_tokens)에 같은 값을 넘깁니다.
+    """
+    return min(max_tokens, estimate_tokens(k * chunk_size))
+
+
+def packing_report(documents):
+    """PackingRetriever가 반환한 문서 목록에서 이번 질문의 PackingReport를 꺼냅니다 (없으면 None)."""
+    for document in documents or []:
+        report = document.metadata.get("context_packing")
+        if report is not None:
+            return PackingReport(**report)
+    return None
+
+
+class PackingRetriever(BaseRetriever):
+    """다른 검색기의 결과를 pack_documents로 압축해 돌려주는 검색기입니다.
+
+    질문마다의 압축 결과(PackingReport)는 반환한 문서의 metadata["context_packing"]에 담깁니다.
+    """
+
+    retriever: Any
+    max_tokens: int = CONTEXT_PACK_MAX_TOKENS
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        documents = self.retriever.get_relevant_documents(query, callbacks=run_manager.get_child())
+        packed, report = pack_documents(documents, self.max_tokens)
+        for document in packed:
+            document.metadata["context_packing"] = report._asdict()
+        return packed
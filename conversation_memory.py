@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+from typing import Any
+
+from langchain_core.memory import BaseMemory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from inference_profiles import CHARS_PER_TOKEN, estimate_tokens
+from llm_scheduler import PRIORITY_BACKGROUND, request_context
+
+# 프롬프트에 넣는 대화 기록(요약 + 최근 대화)의 토큰 상한과, 그중 요약에 떼어 두는 비율
+CHAT_HISTORY_MAX_TOKENS = int(os.environ.get("CHAT_HISTORY_MAX_TOKENS", "800"))
+CHAT_SUMMARY_RATIO = float(os.environ.get("CHAT_SUMMARY_RATIO", "0.3"))
+
+# 메시지마다 역할 표시 등으로 더해지는 토큰 수 (어림값)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """다음은 지금까지의 대화 요약과 그 뒤에 이어진 대화입니다.
+새 대화에서 사용자가 물은 내용, 답변의 핵심, 이후 질문에 필요한 사실을 반영하여 요약을 갱신하세요.
+요약은 {max_chars}자 이내의 문단 하나로 작성하고, 요약 외의 말은 쓰지 마세요.
+
+기존 요약:
+{summary}
+
+새 대화:
+{dialogue}
+
+갱신된 요약:"""
+
+_ROLE_LABELS = {"user": "사용자", "assistant": "어시스턴트"}
+# 추론 모델(deepseek-r1 등)이 요약 앞에 붙이는 생각 과정
+_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+
+def history_budget_tokens(num_ctx, num_predict, reserved_tokens, max_tokens=CHAT_HISTORY_MAX_TOKENS):
+    """모델 컨텍스트(num_ctx)에서 생성 토큰과 검색 컨텍스트·템플릿 몫을 뺀 범위 안에서 대화 기록 예산을 정합니다."""
+    return max(0, min(max_tokens, num_ctx - num_predict - reserved_tokens))
+
+
+def clip_to_tokens(text, max_tokens):
+    """어림한 토큰 수가 max_tokens를 넘으면 앞부분만 남깁니다."""
+    max_chars = max(0, int(max_tokens * CHARS_PER_TOKEN))
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 1)] + "…"
+
+
+def _message_tokens(content):
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationBudget:
+    """토큰 예산 안에서 대화 기록을 유지합니다.
+
+    최근 대화는 그대로 두고, 예산에서 밀려난 오래된 대화는 백그라운드(낮은 우선순위)에서
+    LLM으로 요약에 합칩니다. history()는 요약과 최근 대화를 합쳐 항상 예산 이하로 돌려주므로
+    대화가 길어져도 매 질문의 프롬프트 길이(프리필 시간)가 일정합니다.
+    """
+
+    def __init__(self, llm=None, budget_tokens=CHAT_HISTORY_MAX_TOKENS, summary_ratio=CHAT_SUMMARY_RATIO,
+                 session_id="conversation-summary"):
+        self.llm = llm
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = int(budget_tokens * summary_ratio)
+        self.session_id = session_id
+        self.summary = ""
+        self._turns = []    # 그대로 보관하는 최근 메시지 (role, content)
+        self._pending = []  # 요약에 합칠, 예산에서 밀려난 메시지
+        self._summarizing = False
+        self._generation = 0  # clear() 이전에 시작한 요약 결과를 버리기 위한 세대 번호
+        self._lock = threading.Lock()
+
+    def add_turn(self, question, answer):
+        with self._lock:
+            self._turns.append(("user", question))
+            self._turns.append(("assistant", answer))
+            self._trim_locked()
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self._turns = []
+            self._pending = []
+            self._generation += 1
+
+    def _trim_locked(self):
+        """최근 대화 몫(예산 - 요약 몫)을 넘는 오래된 메시지를 요약 대기열로 옮깁니다."""
+        recent_budget = self.budget_tokens - self.summary_tokens
+        total = sum(_message_tokens(content) for _, content in self._turns)
+        while total > recent_budget and len(self._turns) > 1:
+            role, content = self._turns.pop(0)
+            total -= _message_tokens(content)
+            self._pending.append((role, content))
+        if not self._pending:
+            return
+        if self.llm is None or self.summary_tokens <= 0:
+            # 요약할 LLM이 없으면 밀려난 대화는 버림
+            self._pending = []
+            return
+        if not self._summarizing:
+            self._summarizing = True
+            # 답변 스트리밍의 콜백 설정이 이어지지 않도록 컨텍스트를 복사하지 않은 새 스레드에서 요약
+            threading.Thread(target=self._summarize, name="conversation-summary", daemon=True).start()
+
+    def _summarize(self):
+        while True:
+            with self._lock:
+                batch = list(self._pending)
+                summary = self.summary
+                generation = self._generation
+                if not batch:
+                    self._summarizing = False
+                    return
+
+            dialogue = "\n".join(f"{_ROLE_LABELS.get(role, role)}: {content}" for role, content in batch)
+            prompt = SUMMARY_PROMPT.format(
+                max_chars=int(self.summary_tokens * CHARS_PER_TOKEN),
+                summary=summary or "(없음)",
+                dialogue=dialogue
+            )
+            try:
+                with request_context(session_id=self.session_id, priority=PRIORITY_BACKGROUND):
+                    new_summary = _THINK_RE.sub("", self.llm.invoke(prompt)).strip() or summary
+            except Exception:
+                # 요약에 실패하면 기존 요약을 유지하고 밀려난 대화는 버림
+                new_summary = summary
+
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self.summary = clip_to_tokens(new_summary, self.summary_tokens)
+                del self._pending[:len(batch)]
+
+    def history(self):
+        """프롬프트에 넣을 대화 기록을 {"role", "content"} 목록으로 반환합니다 (요약은 맨 앞의 system 메시지)."""
+        with self._lock:
+            summary = self.summary
+            turns = list(self._turns)
+
+        history = []
+        remaining = self.budget_tokens
+        if summary:
+            content = f"이전 대화 요약: {clip_to_tokens(summary, self.summary_tokens)}"
+            history.append({"role": "system", "content": content})
+            remaining -= _message_tokens(content)
+
+        recent = []
+        for role, content in reversed(turns):
+            cost = _message_tokens(content)
+            if cost > remaining:
+                # 가장 최근 메시지 하나가 예산을 넘으면 잘라서라도 넣음
+                if not recent and remaining > MESSAGE_OVERHEAD_TOKENS:
+                    recent.append({"role": role, "content": clip_to_tokens(content, remaining - MESSAGE_OVERHEAD_TOKENS)})
+                break
+            recent.append({"role": role, "content": content})
+            remaining -= cost
+        history.extend(reversed(recent))
+        return history
+
+    def messages(self):
+        """history()를 LangChain 메시지 객체 목록으로 반환합니다."""
+        types = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+        return [types[m["role"]](content=m["content"]) for m in self.history()]
+
+    def stats(self):
+        history = self.history()
+        with self._lock:
+            return {
+                "budget_tokens": self.budget_tokens,
+                "history_tokens": sum(_message_tokens(m["content"]) for m in history),
+                "recent_messages": len(self._turns),
+                "pending_messages": len(self._pending),
+                "summarized": bool(self.summary),
+            }
+
+
+class ConversationBudgetMemory(BaseMemory):
+    """ConversationBufferMemory 대신 체인에 넣는 토큰 예산 메모리입니다 (ConversationBudget을 감쌈)."""
+
+    conversation: Any
+    memory_key: str = "chat_history"
+    input_key: str = "question"
+    output_key: str = "answer"
+
+    @property
+    def memory_variables(self):
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs):
+        return {self.memory_key: self.conversation.messages()}
+
+    def save_context(self, inputs, outputs):
+        self.conversation.add_turn(inputs[self.input_key], outputs[self.output_key])
+
+    def clear(self):
+        self.conversation.clear()
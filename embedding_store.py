@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 청크 임베딩 저장소 경로
+EMBEDDING_STORE_PATH = os.environ.get(
+    "EMBEDDING_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "streamlit_test1", "embeddings.sqlite3")
+)
+
+# SQLite 변수 개수 제한을 넘지 않도록 한 번에 조회할 키 수
+_LOOKUP_BATCH = 500
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """(임베딩 모델, 청크 해시)를 키로 벡터를 저장하는 SQLite 저장소입니다."""
+
+    def __init__(self, path=EMBEDDING_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, chunk_hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """저장된 벡터를 {청크 해시: 벡터} 형태로 반환합니다."""
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            for i in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model, items):
+        """(청크 해시, 벡터) 목록을 저장합니다."""
+        rows = []
+        for key, vector in items:
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((model, key, int(array.shape[0]), array.tobytes()))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, chunk_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def count(self, model=None):
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)
+            ).fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """처음 보는 청크만 하위 임베딩 모델로 보내고 나머지는 저장소에서 가져옵니다."""
+
+    def __init__(self, embeddings, model, store=None):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store or get_embedding_store()
+        self.hits = 0
+        self.misses = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys = [chunk_hash(text) for text in texts]
+        vectors = self.store.get_many(self.model, set(keys))
+
+        # 같은 문서 안에서 중복된 청크도 한 번만 임베딩
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), new_vectors))
+            self.store.put_many(self.model, new_items)
+            vectors.update(new_items)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+_embedding_store = None
+_embedding_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """프로세스 전체에서 공유하는 임베딩 저장소를 반환합니다."""
+    global _embedding_store
+    with _embedding_store_lock:
+        if _embedding_store is None:
+            _embedding_store = EmbeddingStore()
+        return _embedding_store
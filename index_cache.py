@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import uuid
+
+from langchain_community.vectorstores import FAISS
+
+# 캐시 디렉터리 및 용량 설정
+INDEX_CACHE_DIR = os.environ.get(
+    "INDEX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "streamlit_test1", "faiss_index")
+)
+INDEX_CACHE_MAX_MB = int(os.environ.get("INDEX_CACHE_MAX_MB", "2048"))
+
+# 마지막 사용 시각을 기록하는 파일 (LRU 기준)
+_LAST_USED_FILE = "last_used"
+_META_FILE = "meta.json"
+
+
+def make_index_key(pdf_hash, embed_model, chunk_size, chunk_overlap, extractor="pypdf", index_type="auto"):
+    """PDF의 SHA-256, 임베딩 모델, 청크 파라미터, 텍스트 추출 백엔드, FAISS 인덱스 종류로 캐시 키를 만듭니다."""
+    params = {
+        "pdf": pdf_hash,
+        "embed_model": embed_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "extractor": extractor,
+    }
+    # 기본값(auto)으로 만든 기존 캐시 키가 바뀌지 않도록 고정한 경우에만 포함
+    if index_type != "auto":
+        params["index_type"] = index_type
+    params = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class FaissIndexCache:
+    """FAISS 인덱스와 docstore를 디스크에 저장하는 콘텐츠 주소 기반 캐시입니다."""
+
+    def __init__(self, cache_dir=INDEX_CACHE_DIR, max_bytes=INDEX_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _touch(self, entry_dir):
+        with open(os.path.join(entry_dir, _LAST_USED_FILE), "w") as f:
+            f.write(str(time.time()))
+
+    def _last_used(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, _LAST_USED_FILE)) as f:
+                return float(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def contains(self, key):
+        entry_dir = self._entry_dir(key)
+        return (
+            os.path.exists(os.path.join(entry_dir, "index.faiss"))
+            and os.path.exists(os.path.join(entry_dir, "index.pkl"))
+        )
+
+    def load(self, key, embeddings):
+        """캐시에 인덱스가 있으면 불러오고, 없으면 None을 반환합니다."""
+        if not self.contains(key):
+            return None
+        entry_dir = self._entry_dir(key)
+        try:
+            # 이 캐시가 직접 저장한 파일만 읽으므로 역직렬화를 허용
+            vectorstore = FAISS.load_local(
+                entry_dir,
+                embeddings,
+                allow_dangerous_deserialization=True
+            )
+        except Exception:
+            # 손상된 항목은 제거하고 다시 빌드하도록 함
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        with self._lock:
+            self._touch(entry_dir)
+        return vectorstore
+
+    def save(self, key, vectorstore, meta=None):
+        """인덱스를 임시 디렉터리에 저장한 뒤 원자적으로 교체하고 용량을 정리합니다."""
+        entry_dir = self._entry_dir(key)
+        tmp_dir = os.path.join(self.cache_dir, f".tmp-{key}-{uuid.uuid4().hex}")
+        try:
+            vectorstore.save_local(tmp_dir)
+            with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta or {}, f, ensure_ascii=False)
+            self._touch(tmp_dir)
+            with self._lock:
+                if os.path.exists(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                self._evict(keep=key)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self, keep=None):
+        """용량 상한을 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            size = _dir_size(path)
+            total += size
+            entries.append((self._last_used(path), name, path, size))
+
+        entries.sort()
+        for _, name, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        entries = [
+            name for name in os.listdir(self.cache_dir)
+            if not name.startswith(".tmp-") and os.path.isdir(os.path.join(self.cache_dir, name))
+        ]
+        return {
+            "entries": len(entries),
+            "bytes": _dir_size(self.cache_dir),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache():
+    """프로세스 전체에서 공유하는 인덱스 캐시를 반환합니다."""
+    global _index_cache
+    with _index_cache_lock:
+        if _index_cache is None:
+            _index_cache = FaissIndexCache()
+        return _index_cache
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+
+# 유휴 상태로 이 시간(초)이 지나면 등록된 인덱스를 해제
+INDEX_REGISTRY_IDLE_TTL = int(os.environ.get("INDEX_REGISTRY_IDLE_TTL", "3600"))
+
+
+class IndexRegistry:
+    """문서 해시별로 만들어진 검색기와 RAG 체인을 세션 간에 공유하는 레지스트리입니다."""
+
+    def __init__(self, idle_ttl=INDEX_REGISTRY_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # 같은 문서를 여러 세션이 동시에 올렸을 때 한 번만 빌드하기 위한 키별 잠금
+        self._build_locks = {}
+
+    def _purge_expired_locked(self, now):
+        expired = [
+            key for key, (_, last_used) in self._entries.items()
+            if now - last_used > self.idle_ttl
+        ]
+        for key in expired:
+            del self._entries[key]
+            self._build_locks.pop(key, None)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            self._purge_expired_locked(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry[1] = now
+            return entry[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._purge_expired_locked(now)
+            self._entries[key] = [value, now]
+
+    def get_or_build(self, key, builder):
+        """등록된 값이 있으면 재사용하고, 없으면 builder()로 만들어 등록합니다."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # 다른 세션이 먼저 빌드했을 수 있으므로 다시 확인
+            value = self.get(key)
+            if value is not None:
+                return value
+            value = builder()
+            if value is not None:
+                self.put(key, value)
+            return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._build_locks.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired_locked(time.time())
+            return len(self._entries)
+
+
+_index_registry = None
+_index_registry_lock = threading.Lock()
+
+
+def get_index_registry():
+    """프로세스 전체에서 공유하는 인덱스 레지스트리를 반환합니다."""
+    global _index_registry
+    with _index_registry_lock:
+        if _index_registry is None:
+            _index_registry = IndexRegistry()
+        return _index_registry
@@ -0,0 +1,234 @@
+import os
+import math
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from ollama_client import OllamaError, get_ollama_client
+from llm_scheduler import PRIORITY_BACKGROUND, request_context
+
+# 사용할 추론 프로필 이름 ("auto"면 코어 수와 측정한 생성 속도로 선택)
+INFERENCE_PROFILE = os.environ.get("INFERENCE_PROFILE", "auto")
+# 한 번의 답변 생성이 이 시간(초) 안에 끝나도록 num_predict 상한을 정함
+INFERENCE_TARGET_SECONDS = float(os.environ.get("INFERENCE_TARGET_SECONDS", "60"))
+# 문자 수로 토큰 수를 어림할 때 쓰는 비율 (한국어·영어 혼합 문서 기준)
+CHARS_PER_TOKEN = float(os.environ.get("CHARS_PER_TOKEN", "2.5"))
+
+# num_ctx를 바꾸면 Ollama가 모델을 다시 올리므로 이 단위로 올림하여 값이 자주 바뀌지 않게 함
+NUM_CTX_STEP = 1024
+NUM_CTX_MIN = 2048
+# 고정된 num_ctx 안에서 입력이 커도 남겨 두는 최소 생성 토큰 수
+NUM_PREDICT_MIN = 128
+
+InferenceProfile = namedtuple(
+    "InferenceProfile",
+    [
+        "name",
+        "thread_ratio",     # 물리 코어 중 사용할 비율
+        "num_ctx_max",      # 검색 컨텍스트가 커도 넘지 않을 num_ctx 상한 (KV 캐시 메모리 제한)
+        "num_predict",
+        "temperature",
+        "top_k",
+        "top_p",
+        "repeat_penalty",
+    ]
+)
+
+PROFILES = {
+    # 발열과 소음을 줄이기 위해 코어 절반만 쓰고 짧게 생성
+    "laptop-cool": InferenceProfile("laptop-cool", 0.5, 8192, 384, 0.7, 40, 0.9, 1.1),
+    "balanced": InferenceProfile("balanced", 0.75, 16384, 512, 0.7, 40, 0.9, 1.1),
+    # 전용 서버에서 모든 코어와 긴 컨텍스트 사용
+    "server-throughput": InferenceProfile("server-throughput", 1.0, 32768, 1024, 0.7, 40, 0.9, 1.1),
+}
+
+
+def physical_core_count():
+    """물리 코어 수를 반환합니다 (/proc/cpuinfo를 읽을 수 없으면 논리 코어 수 사용)."""
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":", 1)[1].strip()
+                elif line.startswith("core id"):
+                    core_id = line.split(":", 1)[1].strip()
+                elif not line.strip():
+                    if core_id is not None:
+                        cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+def estimate_tokens(text_or_chars):
+    """문자열(또는 문자 수)의 토큰 수를 어림합니다."""
+    chars = text_or_chars if isinstance(text_or_chars, int) else len(text_or_chars)
+    return int(math.ceil(chars / CHARS_PER_TOKEN))
+
+
+def is_local_endpoint(base_url):
+    """이 프로세스와 같은 호스트의 Ollama인지 확인합니다 (원격 서버의 스레드 수는 여기서 정하지 않음)."""
+    if "," in base_url:
+        return False
+    return urlparse(base_url).hostname in ("localhost", "127.0.0.1", "::1")
+
+
+class Calibrator:
+    """모델별로 짧은 생성 요청을 한 번 보내 초당 생성 토큰 수를 측정합니다."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._results = {}
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _probe(self, model):
+        payload = {
+            "model": model,
+            "prompt": "Count from one to twenty.",
+            "stream": False,
+            # 실제 요청과 같은 로드 옵션(num_ctx, num_thread)을 보내 측정 때문에 모델이 다시 올라가지 않게 함
+            "options": {**load_options(self.base_url, model), "num_predict": 32, "temperature": 0},
+        }
+        with request_context(session_id="calibration", priority=PRIORITY_BACKGROUND):
+            result = get_ollama_client(self.base_url).request("POST", "/api/generate", json_body=payload).json()
+        eval_count = result.get("eval_count") or 0
+        eval_duration = result.get("eval_duration") or 0  # 나노초
+        if not eval_count or not eval_duration:
+            return None
+        return eval_count / (eval_duration / 1e9)
+
+    def start(self, model):
+        """백그라운드에서 측정을 시작합니다 (이미 측정했거나 진행 중이면 무시)."""
+        with self._lock:
+            if model in self._results or model in self._running:
+                return
+            self._running.add(model)
+
+        def target():
+            try:
+                tokens_per_second = self._probe(model)
+            except OllamaError:
+                tokens_per_second = None
+            with self._lock:
+                self._results[model] = tokens_per_second
+                self._running.discard(model)
+
+        threading.Thread(target=target, name=f"ollama-calibrate-{model}", daemon=True).start()
+
+    def tokens_per_second(self, model):
+        with self._lock:
+            return self._results.get(model)
+
+
+_calibrators = {}
+_calibrators_lock = threading.Lock()
+
+# 모델별로 처음 정한 로드 옵션 (num_ctx, num_thread)
+# 이 값이 요청마다 다르면 Ollama가 모델을 다시 올리므로 호출 위치나 속도 측정 결과와 관계없이 같은 값을 사용
+_load_options = {}
+_load_options_lock = threading.Lock()
+
+
+def _load_options_key(base_url, model):
+    # "llama3.2"와 "llama3.2:latest"는 같은 모델
+    return base_url.rstrip("/"), model if ":" in model else f"{model}:latest"
+
+
+def load_options(base_url, model):
+    """inference_options가 모델에 정해 둔 로드 옵션을 반환합니다 (아직 정하지 않았으면 빈 dict)."""
+    with _load_options_lock:
+        return dict(_load_options.get(_load_options_key(base_url, model), {}))
+
+
+def get_calibrator(base_url):
+    """base_url별로 프로세스 전체에서 공유하는 속도 측정기를 반환합니다."""
+    key = base_url.rstrip("/")
+    with _calibrators_lock:
+        if key not in _calibrators:
+            _calibrators[key] = Calibrator(key)
+        return _calibrators[key]
+
+
+def select_profile(name=INFERENCE_PROFILE, tokens_per_second=None, cores=None):
+    """이름으로 프로필을 고릅니다. "auto"면 코어 수와 측정한 생성 속도로 정합니다."""
+    if name in PROFILES:
+        return PROFILES[name]
+    cores = cores or physical_core_count()
+    if cores <= 4 or (tokens_per_second is not None and tokens_per_second < 8):
+        return PROFILES["laptop-cool"]
+    if cores >= 16 and (tokens_per_second is None or tokens_per_second >= 20):
+        return PROFILES["server-throughput"]
+    return PROFILES["balanced"]
+
+
+def size_num_ctx(context_tokens, num_predict, num_ctx_max, model_context_length=None):
+    """프롬프트와 생성 토큰이 들어갈 만큼만 num_ctx를 잡습니다 (NUM_CTX_STEP 단위로 올림)."""
+    needed = context_tokens + num_predict
+    num_ctx = max(NUM_CTX_MIN, int(math.ceil(needed / NUM_CTX_STEP)) * NUM_CTX_STEP)
+    limit = num_ctx_max
+    if model_context_length:
+        limit = min(limit, model_context_length)
+    return min(num_ctx, limit)
+
+
+def inference_options(base_url, model, context_tokens, profile_name=INFERENCE_PROFILE, model_context_length=None):
+    """Ollama LLM 생성자에 넘길 옵션(num_ctx, num_predict, num_thread 등)을 만듭니다.
+
+    context_tokens는 검색 청크, 대화 기록, 프롬프트 템플릿을 합친 예상 입력 토큰 수입니다.
+    num_ctx와 num_thread는 모델별로 처음 호출할 때 정한 값을 이후 모든 호출(미리 올리기, 속도 측정 포함)에서
+    그대로 쓰고, 속도 측정이 끝난 뒤에는 그 안에서 num_predict만 줄입니다.
+    """
+    calibrator = get_calibrator(base_url)
+    tokens_per_second = calibrator.tokens_per_second(model)
+    profile = select_profile(profile_name, tokens_per_second)
+
+    key = _load_options_key(base_url, model)
+    with _load_options_lock:
+        if key not in _load_options:
+            # 측정 전후로 num_predict가 바뀌어도 num_ctx가 그대로이도록 프로필의 num_predict로 크기를 정함
+            pinned = {
+                "num_ctx": size_num_ctx(context_tokens, profile.num_predict, profile.num_ctx_max, model_context_length)
+            }
+            if is_local_endpoint(base_url):
+                pinned["num_thread"] = max(1, int(physical_core_count() * profile.thread_ratio))
+            _load_options[key] = pinned
+        elif model_context_length and _load_options[key]["num_ctx"] > model_context_length:
+            # 모델 카탈로그가 컨텍스트 길이를 나중에 받아 온 경우 모델 한도로 한 번만 줄임
+            _load_options[key]["num_ctx"] = model_context_length
+        pinned = dict(_load_options[key])
+    calibrator.start(model)
+
+    num_predict = profile.num_predict
+    if tokens_per_second:
+        # 측정한 속도로 목표 시간 안에 끝날 만큼만 생성
+        num_predict = max(NUM_PREDICT_MIN, min(num_predict, int(tokens_per_second * INFERENCE_TARGET_SECONDS)))
+    # 입력과 생성 토큰이 고정된 num_ctx 안에 들어가도록 제한
+    num_predict = min(num_predict, max(NUM_PREDICT_MIN, pinned["num_ctx"] - context_tokens))
+
+    return {
+        **pinned,
+        "num_predict": num_predict,
+        "temperature": profile.temperature,
+        "top_k": profile.top_k,
+        "top_p": profile.top_p,
+        "repeat_penalty": profile.repeat_penalty,
+    }
+
+
+def retrieval_context_tokens(k, chunk_size, history_chars=2000, template_chars=600, max_context_tokens=None):
+    """검색 청크 k개, 대화 기록, 프롬프트 템플릿이 차지할 입력 토큰 수를 어림합니다.
+
+    검색 청크를 압축해서 넣으면 max_context_tokens에 압축 예산을 넘겨 청크 몫을 그 값으로 제한합니다.
+    """
+    context_tokens = estimate_tokens(k * chunk_size)
+    if max_context_tokens is not None:
+        context_tokens = min(context_tokens, max_context_tokens)
+    return context_tokens + estimate_tokens(history_chars + template_chars)
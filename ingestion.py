@@ -0,0 +1,209 @@
+import os
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from typing import Any, Dict
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from pdf_extract import get_backend, iter_page_batches
+from llm_scheduler import PRIORITY_BACKGROUND, request_context
+from lexical_index import HYBRID_SEARCH, BM25Index, hybrid_search
+from vector_index import FAISS_INDEX_TYPE, optimize_index
+
+# 한 번에 추출/임베딩/인덱싱할 페이지 수 (작을수록 첫 답변이 빨라짐)
+INGEST_BATCH_PAGES = int(os.environ.get("INGEST_BATCH_PAGES", "8"))
+# 최근 질의 임베딩을 보관하는 개수 (답변 캐시 조회와 검색이 같은 질문을 두 번 임베딩하지 않도록)
+QUERY_EMBEDDING_MEMO_SIZE = 128
+
+
+class IngestionJob:
+    """PDF를 페이지 묶음 단위로 추출 → 청크 분할 → 임베딩 → 인덱스 추가하는 백그라운드 작업입니다.
+
+    인덱싱이 끝나기 전에도 as_retriever()로 지금까지 인덱싱된 범위를 검색할 수 있습니다.
+    """
+
+    def __init__(
+        self,
+        document,
+        embeddings,
+        extractor_name=None,
+        chunk_size=1000,
+        chunk_overlap=200,
+        batch_pages=INGEST_BATCH_PAGES,
+        on_complete=None,
+        index_type=FAISS_INDEX_TYPE,
+    ):
+        self.document = document
+        self.embeddings = embeddings
+        self.extractor = get_backend(
+            extractor_name or (document.extractor_name if document is not None else None)
+        )
+        self.batch_pages = batch_pages
+        self.on_complete = on_complete
+        self.index_type = index_type
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            add_start_index=True
+        )
+
+        self.vectorstore = None
+        # 청크 ID로 FAISS docstore와 연결되는 BM25 역색인 (정확한 조항 번호·회사명·금액 검색용)
+        self.lexical_index = BM25Index()
+        # 인덱싱이 끝난 뒤 고른 FAISS 인덱스의 평면 인덱스 대비 재현율·지연 (캐시에서 불러오면 None)
+        self.index_report = None
+        self.total_pages = 0
+        self.indexed_pages = 0
+        self.indexed_chunks = 0
+        self.error = None
+        self.lock = threading.RLock()
+        self._done = threading.Event()
+        self._thread = None
+        self._query_embeddings = OrderedDict()
+
+    @classmethod
+    def completed(cls, vectorstore, embeddings, document=None):
+        """이미 만들어진 벡터 저장소(예: 캐시 적중)를 완료된 작업으로 감쌉니다."""
+        job = cls(document, embeddings)
+        job.vectorstore = vectorstore
+        job.lexical_index = BM25Index.from_vectorstore(vectorstore)
+        if document is not None:
+            job.total_pages = job.indexed_pages = document.page_count
+        job.indexed_chunks = len(vectorstore.index_to_docstore_id)
+        job._done.set()
+        return job
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def start(self):
+        self.total_pages = self.document.page_count
+        # 호출한 세션의 컨텍스트를 이어받아 실행 (임베딩 요청은 _run_in_background에서 낮은 우선순위로 지정)
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run, args=(self._run_in_background,),
+            name="pdf-ingestion", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run_in_background(self):
+        with request_context(priority=PRIORITY_BACKGROUND):
+            self._run()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def progress(self):
+        """(인덱싱된 페이지 수, 전체 페이지 수)를 반환합니다."""
+        with self.lock:
+            return self.indexed_pages, self.total_pages
+
+    def _add_batch(self, page_texts):
+        documents = []
+        for page_num, text in page_texts:
+            if text.strip():
+                documents.extend(
+                    self.text_splitter.create_documents([text], metadatas=[{"page": page_num}])
+                )
+
+        if documents:
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            ids = [str(uuid.uuid4()) for _ in documents]
+            # 임베딩은 잠금 밖에서 수행해 검색을 막지 않도록 함
+            vectors = self.embeddings.embed_documents(texts)
+            with self.lock:
+                if self.vectorstore is None:
+                    self.vectorstore = FAISS.from_embeddings(
+                        list(zip(texts, vectors)), self.embeddings, metadatas=metadatas, ids=ids
+                    )
+                else:
+                    self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+                self.indexed_chunks += len(documents)
+            # docstore에 들어간 청크만 역색인에 추가 (토큰화는 검색 잠금 밖에서)
+            self.lexical_index.add(ids, texts)
+
+        with self.lock:
+            self.indexed_pages += len(page_texts)
+        # 추출한 텍스트는 문서 객체에도 등록해 다른 소비자가 다시 추출하지 않도록 함
+        self.document.set_page_texts(page_texts)
+
+    def _run(self):
+        try:
+            for page_texts in iter_page_batches(
+                self.document.raw, batch_pages=self.batch_pages, backend=self.extractor.name
+            ):
+                self._add_batch(page_texts)
+            if self.vectorstore is not None:
+                self._optimize_index()
+            if self.on_complete is not None and self.vectorstore is not None:
+                self.on_complete(self)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def _optimize_index(self):
+        """청크를 모두 추가한 뒤 벡터 수에 맞는 인덱스(HNSW, IVF, IVF-PQ)로 바꿉니다.
+
+        인덱싱 중에는 청크를 바로 검색할 수 있도록 평면 인덱스에 추가하고, 새 인덱스를 만드는 동안에도 평면 인덱스로 검색합니다.
+        """
+        with self.lock:
+            flat_index = self.vectorstore.index
+        index, report = optimize_index(flat_index, self.index_type)
+        with self.lock:
+            self.vectorstore.index = index
+            self.index_report = report
+
+    def similarity_search(self, query, **kwargs):
+        # 질의 임베딩은 잠금 밖에서, 인덱스 검색만 잠금 안에서 수행
+        if self.vectorstore is None:
+            return []
+        embedding = self.embed_query(query)
+        with self.lock:
+            return self.vectorstore.similarity_search_by_vector(embedding, **kwargs)
+
+    def hybrid_search(self, query, k=4, fetch_k=None):
+        """벡터 검색과 BM25 검색을 RRF로 합친 상위 k개 청크를 반환합니다."""
+        if self.vectorstore is None:
+            return []
+        embedding = self.embed_query(query)
+        with self.lock:
+            return hybrid_search(self.vectorstore, self.lexical_index, query, embedding, k, fetch_k)
+
+    def embed_query(self, query):
+        """질의를 임베딩합니다 (최근 질의는 다시 요청하지 않음)."""
+        with self.lock:
+            embedding = self._query_embeddings.get(query)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(query)
+                return embedding
+        embedding = self.embeddings.embed_query(query)
+        with self.lock:
+            self._query_embeddings[query] = embedding
+            while len(self._query_embeddings) > QUERY_EMBEDDING_MEMO_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+
+    def as_retriever(self, search_kwargs=None):
+        return IncrementalRetriever(job=self, search_kwargs=search_kwargs or {})
+
+
+class IncrementalRetriever(BaseRetriever):
+    """인덱싱 중인 작업에서 지금까지 인덱싱된 청크만 검색하는 검색기입니다."""
+
+    job: Any
+    search_kwargs: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        if HYBRID_SEARCH:
+            return self.job.hybrid_search(query, **self.search_kwargs)
+        return self.job.similarity_search(query, **self.search_kwargs)
@@ -0,0 +1,176 @@
+import os
+import re
+import math
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Any
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+# 벡터 검색과 BM25 검색 결과를 합쳐서 사용할지 여부
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+# 상호 순위 융합(RRF) 상수 (클수록 하위 순위의 영향이 커짐)
+RRF_K = int(os.environ.get("RRF_K", "60"))
+# 융합 전에 각 검색에서 가져오는 후보 수의 하한
+HYBRID_FETCH_MIN = 20
+# BM25 최고 점수 대비 이 비율 미만인 후보는 흔한 바이그램만 겹친 잡음으로 보고 융합에서 제외
+BM25_MIN_SCORE_RATIO = float(os.environ.get("BM25_MIN_SCORE_RATIO", "0.2"))
+# BM25 1위 점수가 2위의 이 배수 이상이면 융합 순위와 관계없이 결과에 포함 (정확히 일치하는 금액·조항 번호 등)
+BM25_STRONG_HIT_RATIO = float(os.environ.get("BM25_STRONG_HIT_RATIO", "3.0"))
+
+# 조항 번호(3.2.1), 금액(1,000,000), 문서 번호(2024-001)처럼 구분자로 이어진 글자·숫자 묶음
+_RUN_RE = re.compile(r"[0-9a-z가-힣]+(?:[.,\-/][0-9a-z가-힣]+)*")
+_PIECE_RE = re.compile(r"[가-힣]+|[a-z]+|[0-9]+")
+
+
+def tokenize(text):
+    """한국어는 글자 바이그램, 영문은 단어, 숫자는 숫자 단위로 나누고 숫자·영문이 섞인 묶음은 통째로도 남깁니다.
+
+    형태소 분석기 없이도 조사가 붙은 단어("계약서의", "계약서를")가 같은 바이그램을 공유하고,
+    "제3조", "1,000,000원", "ISO-9001" 같은 정확한 표현은 묶음 토큰으로 일치합니다.
+    """
+    tokens = []
+    for run in _RUN_RE.findall(text.lower()):
+        run = run.replace(",", "")
+        pieces = _PIECE_RE.findall(run)
+        if len(pieces) > 1 or not run.isalpha():
+            tokens.append(run)
+        for piece in pieces:
+            if "가" <= piece[0] <= "힣":
+                if len(piece) == 1:
+                    tokens.append(piece)
+                else:
+                    tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+            elif piece != run:
+                tokens.append(piece)
+            elif piece.isalpha():
+                tokens.append(piece)
+    return tokens
+
+
+class BM25Index:
+    """청크 ID별 토큰 빈도를 저장하는 BM25 역색인입니다 (인덱싱 중에도 청크를 추가할 수 있음)."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # 토큰 -> {청크 ID: 빈도}
+        self._lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """FAISS 저장소(예: 디스크 캐시에서 불러온 인덱스)의 docstore로 역색인을 만듭니다."""
+        index = cls()
+        ids = list(vectorstore.index_to_docstore_id.values())
+        index.add(ids, [vectorstore.docstore.search(doc_id).page_content for doc_id in ids])
+        return index
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, doc_ids, texts):
+        entries = [(doc_id, Counter(tokenize(text))) for doc_id, text in zip(doc_ids, texts)]
+        with self._lock:
+            for doc_id, counts in entries:
+                for token, count in counts.items():
+                    self._postings[token][doc_id] = count
+                length = sum(counts.values())
+                self._lengths[doc_id] = length
+                self._total_length += length
+
+    def search(self, query, k):
+        """BM25 점수가 높은 순으로 (청크 ID, 점수)를 최대 k개 반환합니다."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._lengths)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """여러 검색의 ID 순위 목록을 1 / (k + 순위) 합으로 합쳐 점수가 높은 순서의 ID 목록을 반환합니다."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def filter_lexical_hits(hits, min_ratio=BM25_MIN_SCORE_RATIO):
+    """BM25 검색 결과 (청크 ID, 점수) 중 최고 점수 대비 min_ratio 이상인 것만 남깁니다."""
+    if not hits:
+        return []
+    threshold = hits[0][1] * min_ratio
+    return [(doc_id, score) for doc_id, score in hits if score >= threshold]
+
+
+def strong_lexical_hit(hits, ratio=BM25_STRONG_HIT_RATIO):
+    """BM25 1위가 2위보다 ratio배 이상 높으면 그 청크 ID를, 아니면 None을 반환합니다."""
+    if not hits:
+        return None
+    if len(hits) == 1 or hits[0][1] >= hits[1][1] * ratio:
+        return hits[0][0]
+    return None
+
+
+def vector_ranking(vectorstore, embedding, fetch_k):
+    """FAISS 인덱스에서 질의 벡터와 가까운 순서의 청크 ID 목록을 반환합니다."""
+    vector = np.asarray([embedding], dtype=np.float32)
+    _, indices = vectorstore.index.search(vector, min(fetch_k, vectorstore.index.ntotal))
+    return [vectorstore.index_to_docstore_id[i] for i in indices[0] if i != -1]
+
+
+def hybrid_search(vectorstore, lexical_index, query, embedding, k=4, fetch_k=None):
+    """벡터 검색과 BM25 검색 결과를 RRF로 합쳐 상위 k개 Document를 반환합니다.
+
+    BM25 후보는 최고 점수 대비 낮은 잡음을 걸러 낸 뒤 융합하고, 두드러지게 강한 BM25 1위는
+    벡터 검색 순위와 관계없이 결과에 남깁니다.
+    """
+    if vectorstore is None or not vectorstore.index.ntotal:
+        return []
+    fetch_k = fetch_k or max(k * 4, HYBRID_FETCH_MIN)
+    rankings = [vector_ranking(vectorstore, embedding, fetch_k)]
+    strong_hit = None
+    if lexical_index is not None and len(lexical_index):
+        hits = lexical_index.search(query, fetch_k)
+        strong_hit = strong_lexical_hit(hits)
+        rankings.append([doc_id for doc_id, _ in filter_lexical_hits(hits)])
+
+    doc_ids = reciprocal_rank_fusion(rankings)[:k]
+    if strong_hit is not None and strong_hit not in doc_ids and doc_ids:
+        doc_ids[-1] = strong_hit
+    return [vectorstore.docstore.search(doc_id) for doc_id in doc_ids]
+
+
+class HybridRetriever(BaseRetriever):
+    """FAISS 저장소와 BM25 역색인을 함께 검색해 RRF로 합친 결과를 반환하는 검색기입니다."""
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 4
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, k=4):
+        """HYBRID_SEARCH가 꺼져 있으면 역색인 없이 벡터 검색만 합니다."""
+        lexical_index = BM25Index.from_vectorstore(vectorstore) if HYBRID_SEARCH else None
+        return cls(vectorstore=vectorstore, lexical_index=lexical_index, k=k)
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        return hybrid_search(self.vectorstore, self.lexical_index, query, embedding, self.k)
@@ -0,0 +1,232 @@
+import os
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# 동시에 Ollama로 보낼 생성/임베딩 요청 수와 대기열 상한
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "2"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "64"))
+# 대기 중 위치 알림 주기(초)
+LLM_QUEUE_POLL_SECONDS = 0.5
+
+# 숫자가 작을수록 먼저 처리
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# 현재 요청의 세션, 우선순위, 대기열 위치 알림 콜백 (스레드로 넘길 때는 contextvars.copy_context 사용)
+_session_var = contextvars.ContextVar("llm_session", default="default")
+_priority_var = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+_on_wait_var = contextvars.ContextVar("llm_on_wait", default=None)
+
+# 슬롯을 가진 스레드가 다시 요청해도 교착되지 않도록 스레드별 보유 횟수 기록
+# (slot() 블록 안에서 yield하면 다른 스레드에서 이어 실행될 수 있으므로 제너레이터는 acquire/release를 직접 사용)
+_held = threading.local()
+
+
+class SchedulerBusyError(RuntimeError):
+    pass
+
+
+@contextmanager
+def request_context(session_id=None, priority=None, on_wait=None):
+    """이 블록 안의 LLM/임베딩 요청에 세션, 우선순위, 대기열 알림 콜백을 지정합니다."""
+    tokens = []
+    if session_id is not None:
+        tokens.append((_session_var, _session_var.set(str(session_id))))
+    if priority is not None:
+        tokens.append((_priority_var, _priority_var.set(priority)))
+    if on_wait is not None:
+        tokens.append((_on_wait_var, _on_wait_var.set(on_wait)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _Ticket:
+    __slots__ = ("session_id", "priority", "granted")
+
+    def __init__(self, session_id, priority):
+        self.session_id = session_id
+        self.priority = priority
+        self.granted = False
+
+
+class LLMScheduler:
+    """모든 세션의 LLM/임베딩 요청을 동시 실행 수 제한 안에서 처리하는 프로세스 전역 스케줄러입니다.
+
+    우선순위(대화 > 백그라운드 인덱싱)별로 세션마다 대기열을 두고, 같은 우선순위 안에서는
+    세션을 번갈아 처리하여 한 세션의 대량 요청이 다른 사용자를 막지 않게 합니다.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.active = 0
+        # 우선순위 -> OrderedDict(세션 -> deque(티켓)), 앞쪽 세션이 다음 차례
+        self._queues = {}
+        self._queued = 0
+        self._cond = threading.Condition()
+
+    def _dispatch_order_locked(self):
+        """현재 대기열을 처리될 순서대로 나열합니다."""
+        order = []
+        for priority in sorted(self._queues):
+            sessions = [deque(tickets) for tickets in self._queues[priority].values()]
+            while sessions:
+                for tickets in list(sessions):
+                    order.append(tickets.popleft())
+                    if not tickets:
+                        sessions.remove(tickets)
+        return order
+
+    def _next_ticket_locked(self):
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session_id, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            # 처리한 세션은 같은 우선순위 대기열의 맨 뒤로 보냄
+            del sessions[session_id]
+            if tickets:
+                sessions[session_id] = tickets
+            if not sessions:
+                del self._queues[priority]
+            return ticket
+        return None
+
+    def _grant_locked(self):
+        granted = False
+        while self.active < self.max_concurrency:
+            ticket = self._next_ticket_locked()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self._queued -= 1
+            self.active += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _position_locked(self, ticket):
+        for position, queued in enumerate(self._dispatch_order_locked()):
+            if queued is ticket:
+                return position
+        return 0
+
+    def _cancel_locked(self, ticket):
+        sessions = self._queues.get(ticket.priority, {})
+        tickets = sessions.get(ticket.session_id)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            self._queued -= 1
+            if not tickets:
+                del sessions[ticket.session_id]
+            if not sessions:
+                self._queues.pop(ticket.priority, None)
+
+    def acquire(self, session_id=None, priority=None, on_wait=None):
+        session_id = session_id if session_id is not None else _session_var.get()
+        priority = priority if priority is not None else _priority_var.get()
+        on_wait = on_wait if on_wait is not None else _on_wait_var.get()
+
+        ticket = _Ticket(session_id, priority)
+        with self._cond:
+            if self.max_queue and self._queued >= self.max_queue:
+                raise SchedulerBusyError("요청이 너무 많습니다. 잠시 후 다시 시도하세요.")
+            self._queues.setdefault(priority, OrderedDict()).setdefault(session_id, deque()).append(ticket)
+            self._queued += 1
+            self._grant_locked()
+
+        last_position = None
+        try:
+            while True:
+                with self._cond:
+                    if ticket.granted:
+                        break
+                    position = self._position_locked(ticket)
+                # UI 콜백은 잠금 밖에서 호출
+                if on_wait is not None and position != last_position:
+                    last_position = position
+                    on_wait(position + 1)
+                with self._cond:
+                    if not ticket.granted:
+                        self._cond.wait(LLM_QUEUE_POLL_SECONDS)
+        except BaseException:
+            with self._cond:
+                if ticket.granted:
+                    self.active -= 1
+                    self._grant_locked()
+                else:
+                    self._cancel_locked(ticket)
+            raise
+
+        if last_position is not None:
+            on_wait(0)
+        return ticket
+
+    def set_max_concurrency(self, max_concurrency):
+        with self._cond:
+            self.max_concurrency = max(1, max_concurrency)
+            self._grant_locked()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._grant_locked()
+
+    @contextmanager
+    def slot(self, session_id=None, priority=None, on_wait=None):
+        """실행 슬롯을 얻을 때까지 기다렸다가 블록이 끝나면 반환합니다 (같은 스레드 안의 중첩 요청은 그대로 통과).
+
+        중첩 여부를 스레드별로 기록하므로 블록이 한 스레드 안에서 끝나는 동기 호출에만 사용합니다.
+        """
+        depth = getattr(_held, "depth", 0)
+        if depth:
+            _held.depth = depth + 1
+            try:
+                yield
+            finally:
+                _held.depth -= 1
+            return
+
+        self.acquire(session_id, priority, on_wait)
+        _held.depth = 1
+        try:
+            yield
+        finally:
+            _held.depth = 0
+            self.release()
+
+    def queue_length(self, session_id=None):
+        with self._cond:
+            if session_id is None:
+                return self._queued
+            return sum(
+                len(sessions.get(str(session_id), ()))
+                for sessions in self._queues.values()
+            )
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "queued": self._queued,
+                "max_concurrency": self.max_concurrency,
+            }
+
+
+_llm_scheduler = None
+_llm_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    """프로세스 전체에서 공유하는 LLM 요청 스케줄러를 반환합니다."""
+    global _llm_scheduler
+    with _llm_scheduler_lock:
+        if _llm_scheduler is None:
+            _llm_scheduler = LLMScheduler()
+        return _llm_scheduler
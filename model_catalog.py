@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+from collections import namedtuple
+
+from ollama_client import OllamaError, get_ollama_client
+
+# 서버 상태·모델 목록을 다시 조회하기까지의 시간(초). 서버가 응답하지 않을 때는 더 자주 확인
+OLLAMA_CATALOG_TTL = float(os.environ.get("OLLAMA_CATALOG_TTL", "30"))
+OLLAMA_CATALOG_DOWN_TTL = float(os.environ.get("OLLAMA_CATALOG_DOWN_TTL", "5"))
+
+ModelInfo = namedtuple(
+    "ModelInfo",
+    ["name", "size", "family", "parameter_size", "quantization", "context_length", "digest"]
+)
+
+CatalogSnapshot = namedtuple("CatalogSnapshot", ["healthy", "models", "error", "fetched_at"])
+
+
+def _context_length(show):
+    # model_info 키는 "<아키텍처>.context_length" 형태 (예: llama.context_length)
+    for key, value in (show.get("model_info") or {}).items():
+        if key.endswith(".context_length"):
+            return int(value)
+    return None
+
+
+class ModelCatalog:
+    """Ollama 서버 상태와 설치된 모델 목록을 TTL 동안 캐시하고 만료되면 백그라운드에서 갱신합니다.
+
+    재실행마다 HTTP 요청을 보내는 대신 모든 세션이 같은 스냅샷을 읽습니다.
+    처음에는 /api/tags만 한 번 동기적으로 조회하고 모델별 /api/show 정보는 백그라운드 갱신에서 채우며,
+    이후에는 만료된 스냅샷을 돌려주면서 갱신을 시작합니다.
+    """
+
+    def __init__(self, base_url, ttl=OLLAMA_CATALOG_TTL, down_ttl=OLLAMA_CATALOG_DOWN_TTL):
+        self.client = get_ollama_client(base_url)
+        self.ttl = ttl
+        self.down_ttl = down_ttl
+        self._snapshot = None
+        # /api/show 결과는 모델 digest가 같으면 바뀌지 않으므로 digest별로 보관 (성공한 조회만)
+        self._show_cache = {}
+        self._lock = threading.Lock()
+        # 첫 조회를 한 세션만 수행하고 나머지는 그 결과를 기다리도록 하는 잠금
+        self._cold_lock = threading.Lock()
+        self._refreshing = False
+
+    def _context_length_of(self, name, digest):
+        with self._lock:
+            if digest in self._show_cache:
+                return self._show_cache[digest]
+        try:
+            context_length = _context_length(self.client.show(name))
+        except OllamaError:
+            # 일시적인 실패는 기억하지 않고 다음 갱신에서 다시 조회
+            return None
+        with self._lock:
+            self._show_cache[digest] = context_length
+        return context_length
+
+    def _fetch(self, include_show=True):
+        try:
+            tags = self.client.list_models()
+        except OllamaError as e:
+            return CatalogSnapshot(False, {}, str(e), time.time())
+
+        models = {}
+        for tag in tags:
+            name = tag.get("name") or tag.get("model")
+            details = tag.get("details") or {}
+            digest = tag.get("digest")
+            if include_show:
+                context_length = self._context_length_of(name, digest)
+            else:
+                with self._lock:
+                    context_length = self._show_cache.get(digest)
+            models[name] = ModelInfo(
+                name=name,
+                size=tag.get("size"),
+                family=details.get("family"),
+                parameter_size=details.get("parameter_size"),
+                quantization=details.get("quantization_level"),
+                context_length=context_length,
+                digest=digest,
+            )
+        return CatalogSnapshot(True, models, None, time.time())
+
+    def _is_stale(self, snapshot):
+        ttl = self.ttl if snapshot.healthy else self.down_ttl
+        return time.time() - snapshot.fetched_at > ttl
+
+    def _refresh_in_background(self):
+        def target():
+            try:
+                snapshot = self._fetch()
+                with self._lock:
+                    self._snapshot = snapshot
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=target, name="ollama-catalog", daemon=True).start()
+
+    def snapshot(self):
+        """현재 스냅샷을 반환합니다. 만료되었으면 갱신을 예약하고 이전 값을 그대로 돌려줍니다."""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                if self._is_stale(snapshot) and not self._refreshing:
+                    self._refreshing = True
+                    self._refresh_in_background()
+                return snapshot
+
+        # 첫 조회는 결과가 있어야 하므로 /api/tags만 동기적으로 한 번 수행하고,
+        # 모델별 /api/show 정보는 바로 이어지는 백그라운드 갱신에서 채움
+        with self._cold_lock:
+            with self._lock:
+                if self._snapshot is not None:
+                    return self._snapshot
+            snapshot = self._fetch(include_show=False)
+            with self._lock:
+                if self._snapshot is None or snapshot.fetched_at > self._snapshot.fetched_at:
+                    self._snapshot = snapshot
+                if snapshot.models and not self._refreshing:
+                    self._refreshing = True
+                    self._refresh_in_background()
+                return self._snapshot
+
+    def refresh(self):
+        """캐시를 무시하고 즉시 다시 조회합니다 (모델 설치 직후 등)."""
+        snapshot = self._fetch()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def is_healthy(self):
+        return self.snapshot().healthy
+
+    def model_names(self):
+        return list(self.snapshot().models)
+
+    def get(self, name):
+        """모델 정보를 반환합니다. 태그가 없는 이름은 ':latest'로도 찾습니다."""
+        models = self.snapshot().models
+        if name in models:
+            return models[name]
+        if ":" not in name:
+            return models.get(f"{name}:latest")
+        return None
+
+    def has_model(self, name):
+        return self.get(name) is not None
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_model_catalog(base_url):
+    """base_url별로 프로세스 전체에서 공유하는 모델 카탈로그를 반환합니다."""
+    key = base_url.rstrip("/")
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = ModelCatalog(key)
+        return _catalogs[key]
@@ -0,0 +1,222 @@
+import os
+import time
+import threading
+
+from ollama_client import OllamaError, get_ollama_client
+from llm_scheduler import PRIORITY_BACKGROUND, request_context
+
+# 모델별 기본 keep_alive (Ollama 형식: "30m", "1h", 초 단위 정수, -1은 무기한)
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# 이 시간(초) 동안 사용되지 않은 모델은 메모리가 부족할 때 내릴 수 있음
+OLLAMA_MODEL_IDLE_SECONDS = float(os.environ.get("OLLAMA_MODEL_IDLE_SECONDS", "300"))
+# 상주 모델 크기 합계 상한 (MB, 0이면 제한 없음)
+OLLAMA_MAX_RESIDENT_MB = int(os.environ.get("OLLAMA_MAX_RESIDENT_MB", "0"))
+# 호스트의 사용 가능 메모리가 이 값(MB)보다 적으면 유휴 모델을 내림
+OLLAMA_MIN_FREE_MB = int(os.environ.get("OLLAMA_MIN_FREE_MB", "1024"))
+# /api/ps 결과를 재사용하는 시간(초)
+OLLAMA_PS_TTL = float(os.environ.get("OLLAMA_PS_TTL", "5"))
+
+MB = 1024 * 1024
+
+
+def available_memory_bytes():
+    """/proc/meminfo의 MemAvailable을 반환합니다 (리눅스가 아니면 None)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def model_key(model):
+    """태그가 없는 모델 이름에 ':latest'를 붙여 /api/ps의 이름과 맞춥니다."""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelManager:
+    """Ollama API로 모델을 미리 올리고(keep_alive 지정) 상주 모델을 추적하며,
+    메모리가 부족하면 오래 쓰지 않은 모델부터 내립니다.
+
+    `ollama run` 프로세스를 띄우지 않으므로 고아 프로세스가 남지 않습니다.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        default_keep_alive=OLLAMA_KEEP_ALIVE,
+        idle_seconds=OLLAMA_MODEL_IDLE_SECONDS,
+        max_resident_bytes=OLLAMA_MAX_RESIDENT_MB * MB,
+        min_free_bytes=OLLAMA_MIN_FREE_MB * MB,
+    ):
+        self.base_url = base_url
+        self.client = get_ollama_client(base_url)
+        self.default_keep_alive = default_keep_alive
+        self.idle_seconds = idle_seconds
+        self.max_resident_bytes = max_resident_bytes
+        self.min_free_bytes = min_free_bytes
+        self._keep_alive = {}
+        self._embedding_models = set()
+        self._last_used = {}
+        self._resident = None
+        self._resident_at = 0.0
+        self._loading = {}
+        self._warming = set()
+        self._enforcing = False
+        self._lock = threading.Lock()
+
+    def set_keep_alive(self, model, keep_alive):
+        with self._lock:
+            self._keep_alive[model_key(model)] = keep_alive
+
+    def keep_alive_for(self, model):
+        with self._lock:
+            return self._keep_alive.get(model_key(model), self.default_keep_alive)
+
+    def mark_used(self, model, embedding=False):
+        with self._lock:
+            self._last_used[model_key(model)] = time.time()
+            if embedding:
+                self._embedding_models.add(model_key(model))
+
+    def resident_models(self, refresh=False):
+        """메모리에 올라와 있는 모델의 {이름: /api/ps 항목}을 반환합니다 (짧게 캐시)."""
+        with self._lock:
+            if not refresh and self._resident is not None and time.time() - self._resident_at < OLLAMA_PS_TTL:
+                return dict(self._resident)
+        try:
+            resident = {m.get("name") or m.get("model"): m for m in self.client.running_models()}
+        except OllamaError:
+            resident = {}
+        with self._lock:
+            self._resident = resident
+            self._resident_at = time.time()
+            return dict(resident)
+
+    def is_resident(self, model):
+        return model_key(model) in self.resident_models()
+
+    def ensure_loaded(self, model, embedding=False, options=None):
+        """모델이 메모리에 없으면 올립니다. 같은 모델을 동시에 요청하면 한 번만 로드합니다.
+
+        options를 주지 않으면 추론 프로필이 이 모델에 정해 둔 로드 옵션(num_ctx, num_thread)으로 올립니다.
+        """
+        self.mark_used(model, embedding)
+        if self.is_resident(model):
+            return True
+
+        with self._lock:
+            load_lock = self._loading.setdefault(model_key(model), threading.Lock())
+        with load_lock:
+            if self.is_resident(model):
+                return True
+            self.enforce_memory_budget(keep=model_key(model))
+            if options is None and not embedding:
+                # 순환 임포트를 피해 지연 임포트 (inference_profiles가 ollama_client를 사용)
+                from inference_profiles import load_options
+                options = load_options(self.base_url, model)
+            self.client.load_model(model, self.keep_alive_for(model), embedding=embedding, options=options)
+            self.resident_models(refresh=True)
+        return True
+
+    def warm_up(self, model, embedding=False):
+        """백그라운드 스레드에서 모델을 미리 올립니다 (이미 진행 중이면 무시)."""
+        key = model_key(model)
+        with self._lock:
+            recently_resident = (
+                self._resident is not None
+                and key in self._resident
+                and time.time() - self._resident_at < OLLAMA_PS_TTL
+            )
+            if key in self._warming or recently_resident:
+                return
+            self._warming.add(key)
+
+        def target():
+            try:
+                # 모델 미리 올리기는 대화 요청보다 뒤에 처리
+                with request_context(session_id="model-warmup", priority=PRIORITY_BACKGROUND):
+                    self.ensure_loaded(model, embedding)
+            except OllamaError:
+                pass
+            finally:
+                with self._lock:
+                    self._warming.discard(key)
+
+        threading.Thread(target=target, name=f"ollama-warmup-{model}", daemon=True).start()
+
+    def request_finished(self, model, embedding=False):
+        """생성·임베딩 요청이 끝날 때 호출합니다.
+
+        요청으로 모델이 새로 올라왔을 수 있으므로 상주 모델 목록을 다시 읽고 메모리 상한을 확인합니다.
+        응답을 늦추지 않도록 백그라운드에서 한 번에 하나씩만 실행합니다.
+        """
+        self.mark_used(model, embedding)
+        with self._lock:
+            self._resident_at = 0.0
+            if self._enforcing:
+                return
+            self._enforcing = True
+
+        def target():
+            try:
+                self.enforce_memory_budget(keep=model_key(model))
+            except OllamaError:
+                pass
+            finally:
+                with self._lock:
+                    self._enforcing = False
+
+        threading.Thread(target=target, name="ollama-memory-budget", daemon=True).start()
+
+    def unload(self, model):
+        with self._lock:
+            embedding = model_key(model) in self._embedding_models
+        self.client.unload_model(model, embedding=embedding)
+        self.resident_models(refresh=True)
+
+    def _under_pressure(self, resident):
+        if self.max_resident_bytes:
+            total = sum(m.get("size", 0) for m in resident.values())
+            if total > self.max_resident_bytes:
+                return True
+        available = available_memory_bytes()
+        return available is not None and available < self.min_free_bytes
+
+    def enforce_memory_budget(self, keep=None):
+        """메모리가 부족한 동안 유휴 시간이 긴 모델부터 내리고, 내린 모델 이름 목록을 반환합니다."""
+        resident = self.resident_models(refresh=True)
+        now = time.time()
+        with self._lock:
+            candidates = sorted(
+                (self._last_used.get(name, 0.0), name)
+                for name in resident
+                if name != keep and now - self._last_used.get(name, 0.0) > self.idle_seconds
+            )
+
+        unloaded = []
+        for _, name in candidates:
+            if not self._under_pressure(resident):
+                break
+            try:
+                self.unload(name)
+            except OllamaError:
+                continue
+            resident.pop(name, None)
+            unloaded.append(name)
+        return unloaded
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_model_manager(base_url):
+    """base_url별로 프로세스 전체에서 공유하는 모델 관리자를 반환합니다."""
+    key = base_url.rstrip("/")
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = ModelManager(key)
+        return _managers[key]
@@ -0,0 +1,295 @@
+import os
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_community.llms import Ollama
+
+from llm_scheduler import get_llm_scheduler
+
+# 연결 풀 및 타임아웃 설정
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3"))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "120"))
+OLLAMA_HEALTH_TIMEOUT = float(os.environ.get("OLLAMA_HEALTH_TIMEOUT", "2"))
+OLLAMA_MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "2"))
+
+# 서킷 브레이커 설정: 연속 실패 횟수와 차단 유지 시간(초)
+OLLAMA_BREAKER_THRESHOLD = int(os.environ.get("OLLAMA_BREAKER_THRESHOLD", "5"))
+OLLAMA_BREAKER_RESET = float(os.environ.get("OLLAMA_BREAKER_RESET", "30"))
+
+# 재시도할 가치가 있는 일시적 오류 상태 코드
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# 모델을 실제로 돌리는 엔드포인트 (스케줄러의 동시 실행 제한 대상)
+_SCHEDULED_PATHS = {"/api/generate", "/api/chat", "/api/embed", "/api/embeddings"}
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(OllamaError):
+    pass
+
+
+class CircuitBreaker:
+    """연속 실패가 임계값을 넘으면 일정 시간 요청을 즉시 거절하고, 이후 한 번 시험 요청을 허용합니다."""
+
+    def __init__(self, failure_threshold=OLLAMA_BREAKER_THRESHOLD, reset_timeout=OLLAMA_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # half-open: 시험 요청은 한 번에 하나만 허용
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class OllamaClient:
+    """keep-alive 연결 풀을 공유하는 Ollama HTTP 클라이언트입니다 (타임아웃, 재시도, 서킷 브레이커 포함)."""
+
+    def __init__(
+        self,
+        base_url,
+        pool_size=OLLAMA_POOL_SIZE,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=OLLAMA_READ_TIMEOUT,
+        max_retries=OLLAMA_MAX_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, json_body=None, timeout=None, stream=False, retries=None):
+        """요청을 보내고 성공한 응답을 반환합니다. 연결 오류와 일시적 오류는 백오프 후 재시도합니다.
+
+        생성/임베딩 요청은 스케줄러 슬롯을 얻은 뒤에 보냅니다 (스트리밍은 stream_lines에서 처리).
+        """
+        if path in _SCHEDULED_PATHS and not stream:
+            with get_llm_scheduler().slot():
+                return self._send(method, path, json_body, timeout, stream, retries)
+        return self._send(method, path, json_body, timeout, stream, retries)
+
+    def _send(self, method, path, json_body=None, timeout=None, stream=False, retries=None):
+        retries = self.max_retries if retries is None else retries
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        url = f"{self.base_url}{path}"
+
+        last_error = None
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(
+                    f"Ollama 서버({self.base_url}) 요청이 연속으로 실패하여 잠시 차단되었습니다."
+                )
+            try:
+                response = self.session.request(
+                    method, url, json=json_body, timeout=timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                last_error = e
+            else:
+                if response.status_code in _RETRY_STATUS:
+                    self.breaker.record_failure()
+                    last_error = OllamaError(
+                        f"Ollama 요청 실패 ({response.status_code}): {response.text[:200]}"
+                    )
+                    response.close()
+                elif response.status_code >= 400:
+                    # 잘못된 요청(모델 없음 등)은 서버 상태와 무관하므로 브레이커에 반영하지 않음
+                    self.breaker.record_success()
+                    detail = response.text[:200]
+                    response.close()
+                    raise OllamaError(f"Ollama 요청 실패 ({response.status_code}): {detail}")
+                else:
+                    self.breaker.record_success()
+                    return response
+
+            if attempt < retries:
+                time.sleep(min(0.5 * (2 ** attempt), 8.0))
+
+        raise OllamaError(f"Ollama 요청이 {retries + 1}회 모두 실패했습니다: {last_error}")
+
+    def health(self):
+        """서버가 응답하는지 짧은 타임아웃으로 확인합니다."""
+        try:
+            self.request(
+                "GET", "/api/version",
+                timeout=(OLLAMA_HEALTH_TIMEOUT, OLLAMA_HEALTH_TIMEOUT),
+                retries=0
+            ).close()
+            return True
+        except OllamaError:
+            return False
+
+    def list_models(self):
+        """설치된 모델 목록(/api/tags의 models 항목)을 반환합니다."""
+        response = self.request("GET", "/api/tags", timeout=(self.connect_timeout, 10))
+        return response.json().get("models", [])
+
+    def show(self, model):
+        """모델 상세 정보(/api/show: details, model_info 등)를 반환합니다."""
+        response = self.request("POST", "/api/show", json_body={"model": model}, timeout=(self.connect_timeout, 10))
+        return response.json()
+
+    def running_models(self):
+        """현재 메모리에 올라와 있는 모델 목록(/api/ps의 models 항목)을 반환합니다."""
+        response = self.request("GET", "/api/ps", timeout=(self.connect_timeout, 10))
+        return response.json().get("models", [])
+
+    def load_model(self, model, keep_alive, embedding=False, options=None):
+        """빈 요청으로 모델을 메모리에 올리고 keep_alive 동안 유지하도록 합니다.
+
+        options에는 실제 요청과 같은 로드 옵션(num_ctx, num_thread)을 넘겨야 첫 요청에서 다시 올리지 않습니다.
+        """
+        if embedding:
+            payload = {"model": model, "input": [], "keep_alive": keep_alive}
+            self.request("POST", "/api/embed", json_body=payload).close()
+        else:
+            payload = {"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive}
+            if options:
+                payload["options"] = dict(options)
+            self.request("POST", "/api/generate", json_body=payload).close()
+
+    def unload_model(self, model, embedding=False):
+        """keep_alive=0 요청으로 모델을 즉시 메모리에서 내립니다."""
+        if embedding:
+            payload = {"model": model, "input": [], "keep_alive": 0}
+            self.request("POST", "/api/embed", json_body=payload, retries=0).close()
+        else:
+            payload = {"model": model, "prompt": "", "stream": False, "keep_alive": 0}
+            self.request("POST", "/api/generate", json_body=payload, retries=0).close()
+
+    def stream_lines(self, path, payload):
+        """스트리밍 응답의 JSON 줄을 문자열로 돌려줍니다 (응답 시작 전 실패만 재시도).
+
+        응답이 끝날 때까지 스케줄러 슬롯을 유지합니다. LCEL은 제너레이터를 실행기의 여러 스레드에서
+        이어 실행하므로 스레드별 중첩 기록을 쓰는 slot() 대신 슬롯을 직접 얻고 반환합니다.
+        """
+        scheduler = get_llm_scheduler()
+        scheduler.acquire()
+        try:
+            response = self.request("POST", path, json_body=payload, stream=True)
+            response.encoding = "utf-8"
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    yield line
+            finally:
+                response.close()
+        finally:
+            scheduler.release()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url):
+    """base_url별로 프로세스 전체에서 공유하는 Ollama 클라이언트를 반환합니다.
+
+    쉼표로 구분된 여러 주소를 받으면 서버 간 부하 분산·장애 조치를 하는 OllamaRouter를 반환합니다.
+    """
+    key = base_url.rstrip("/")
+    with _clients_lock:
+        if key not in _clients:
+            if "," in key:
+                from ollama_router import OllamaRouter, parse_base_urls
+                _clients[key] = OllamaRouter(parse_base_urls(key))
+            else:
+                _clients[key] = OllamaClient(key)
+        return _clients[key]
+
+
+class PooledOllama(Ollama):
+    """생성 요청을 공유 OllamaClient(연결 풀, 타임아웃, 재시도, 서킷 브레이커)로 보내는 Ollama LLM입니다."""
+
+    def _create_stream(self, api_url, payload, stop=None, **kwargs):
+        if self.stop is not None and stop is not None:
+            raise ValueError("`stop` found in both the input and default params.")
+        elif self.stop is not None:
+            stop = self.stop
+
+        params = dict(self._default_params)
+        for key in self._default_params:
+            if key in kwargs:
+                params[key] = kwargs[key]
+
+        if "options" in kwargs:
+            params["options"] = kwargs["options"]
+        else:
+            params["options"] = {
+                **params["options"],
+                "stop": stop,
+                **{k: v for k, v in kwargs.items() if k not in self._default_params},
+            }
+
+        if payload.get("messages"):
+            request_payload = {"messages": payload.get("messages", []), **params}
+        else:
+            request_payload = {
+                "prompt": payload.get("prompt"),
+                "images": payload.get("images", []),
+                **params,
+            }
+
+        # 모델 관리자가 정한 keep_alive를 적용하고 사용 시각을 기록 (순환 임포트를 피해 지연 임포트)
+        from model_manager import get_model_manager
+        manager = get_model_manager(self.base_url)
+        manager.mark_used(self.model)
+        if request_payload.get("keep_alive") is None:
+            request_payload["keep_alive"] = manager.keep_alive_for(self.model)
+
+        # api_url은 base_url 뒤에 /api/generate 또는 /api/chat이 붙은 형태
+        client = get_ollama_client(self.base_url)
+        path = "/api/" + api_url.rstrip("/").rsplit("/api/", 1)[-1]
+
+        def stream():
+            try:
+                yield from client.stream_lines(path, request_payload)
+            finally:
+                # 요청으로 모델이 새로 올라왔을 수 있으므로 상주 모델 목록을 갱신하고 메모리 상한을 확인
+                manager.request_finished(self.model)
+
+        return stream()
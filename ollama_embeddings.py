@@ -0,0 +1,95 @@
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+from ollama_client import OllamaError, get_ollama_client
+from model_manager import get_model_manager
+
+# 배치 임베딩 기본 설정
+EMBED_BATCH_SIZE = int(os.environ.get("OLLAMA_EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.environ.get("OLLAMA_EMBED_MAX_RETRIES", "3"))
+EMBED_TIMEOUT = float(os.environ.get("OLLAMA_EMBED_TIMEOUT", "120"))
+
+
+class OllamaEmbedError(OllamaError):
+    pass
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """Ollama /api/embed 엔드포인트로 청크를 배치 단위로 병렬 임베딩합니다."""
+
+    def __init__(
+        self,
+        model,
+        base_url="http://localhost:11434",
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_MAX_CONCURRENCY,
+        max_retries=EMBED_MAX_RETRIES,
+        timeout=EMBED_TIMEOUT,
+        keep_alive=None,
+    ):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+
+    @property
+    def client(self):
+        # 생성 요청과 같은 keep-alive 연결 풀·서킷 브레이커를 공유
+        return get_ollama_client(self.base_url)
+
+    def _embed_batch(self, texts):
+        # keep_alive를 지정하지 않으면 모델 관리자의 모델별 설정을 따름
+        manager = get_model_manager(self.base_url)
+        manager.mark_used(self.model, embedding=True)
+        keep_alive = self.keep_alive if self.keep_alive is not None else manager.keep_alive_for(self.model)
+        payload = {"model": self.model, "input": texts, "keep_alive": keep_alive}
+
+        try:
+            response = self.client.request(
+                "POST", "/api/embed",
+                json_body=payload,
+                timeout=(self.client.connect_timeout, self.timeout),
+                retries=self.max_retries
+            )
+        except OllamaError as e:
+            raise OllamaEmbedError(str(e)) from e
+        finally:
+            manager.request_finished(self.model, embedding=True)
+
+        embeddings = response.json().get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            raise OllamaEmbedError("Ollama 임베딩 응답의 개수가 입력과 다릅니다.")
+        return embeddings
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) == 1 or self.max_concurrency == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            # map은 입력 순서대로 결과를 돌려주므로 청크 순서가 보존됨
+            # 작업 스레드에서도 호출한 세션의 스케줄러 컨텍스트(세션, 우선순위)를 유지
+            contexts = [contextvars.copy_context() for _ in batches]
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(
+                    lambda context, batch: context.run(self._embed_batch, batch),
+                    contexts, batches
+                ))
+
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0]
@@ -0,0 +1,226 @@
+import os
+import time
+import threading
+
+from ollama_client import (
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_MAX_RETRIES,
+    CircuitOpenError,
+    OllamaClient,
+    OllamaError,
+    _SCHEDULED_PATHS,
+)
+from llm_scheduler import LLM_MAX_CONCURRENCY, get_llm_scheduler
+
+# 엔드포인트별 상주 모델(/api/ps)을 다시 조회하기까지의 시간(초)
+OLLAMA_ROUTER_PS_TTL = float(os.environ.get("OLLAMA_ROUTER_PS_TTL", "5"))
+
+
+def parse_base_urls(value):
+    """쉼표로 구분된 Ollama 주소 목록을 정리해 반환합니다."""
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+def _model_key(model):
+    return model if ":" in model else f"{model}:latest"
+
+
+class Endpoint:
+    """라우터가 관리하는 Ollama 서버 하나의 상태 (연결 풀, 진행 중 요청 수, 상주 모델)입니다."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.client = OllamaClient(base_url)
+        self.in_flight = 0
+        self.loaded = set()
+        self.loaded_at = 0.0
+        self.refreshing = False
+
+    @property
+    def healthy(self):
+        return self.client.breaker.state != "open"
+
+
+class OllamaRouter:
+    """여러 Ollama 서버에 요청을 나누어 보내는 OllamaClient 호환 라우터입니다.
+
+    모델이 이미 올라와 있는 서버 중 진행 중인 요청이 가장 적은 곳을 고르고,
+    응답이 시작되기 전에 실패하면 다음 서버로 넘깁니다.
+    """
+
+    def __init__(self, base_urls, max_retries=OLLAMA_MAX_RETRIES):
+        self.endpoints = [Endpoint(url) for url in base_urls]
+        self.base_url = ",".join(base_urls)
+        self.connect_timeout = OLLAMA_CONNECT_TIMEOUT
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        # 서버 수만큼 동시에 처리할 수 있으므로 스케줄러의 동시 실행 수를 늘림
+        get_llm_scheduler().set_max_concurrency(LLM_MAX_CONCURRENCY * len(self.endpoints))
+
+    def _refresh_loaded(self, endpoint):
+        def target():
+            try:
+                models = endpoint.client.running_models()
+                loaded = {m.get("name") or m.get("model") for m in models}
+            except OllamaError:
+                loaded = set()
+            with self._lock:
+                endpoint.loaded = loaded
+                endpoint.loaded_at = time.time()
+                endpoint.refreshing = False
+
+        threading.Thread(target=target, name="ollama-router-ps", daemon=True).start()
+
+    def _candidates(self, model=None):
+        """요청을 보낼 순서대로 엔드포인트를 나열합니다."""
+        now = time.time()
+        with self._lock:
+            for endpoint in self.endpoints:
+                if now - endpoint.loaded_at > OLLAMA_ROUTER_PS_TTL and not endpoint.refreshing:
+                    endpoint.refreshing = True
+                    self._refresh_loaded(endpoint)
+            key = _model_key(model) if model else None
+
+            def rank(endpoint):
+                return (
+                    not endpoint.healthy,
+                    key is not None and key not in endpoint.loaded,
+                    endpoint.in_flight,
+                )
+
+            return sorted(self.endpoints, key=rank)
+
+    def _acquire(self, endpoint):
+        with self._lock:
+            endpoint.in_flight += 1
+
+    def _release(self, endpoint):
+        with self._lock:
+            endpoint.in_flight -= 1
+
+    def _mark_loaded(self, endpoint, model):
+        # 생성/임베딩 요청을 처리한 서버에는 모델이 올라와 있으므로 다음 /api/ps 조회 전에도 반영
+        with self._lock:
+            endpoint.loaded.add(_model_key(model))
+
+    def _send(self, method, path, json_body=None, timeout=None, stream=False, retries=None):
+        model = (json_body or {}).get("model")
+        retries = self.max_retries if retries is None else retries
+        candidates = self._candidates(model)
+        last_error = None
+        for index, endpoint in enumerate(candidates):
+            # 다음 서버가 남아 있으면 같은 서버에서 재시도하지 않고 바로 넘김
+            endpoint_retries = 0 if index < len(candidates) - 1 else retries
+            self._acquire(endpoint)
+            try:
+                response = endpoint.client._send(method, path, json_body, timeout, stream, endpoint_retries)
+            except OllamaError as e:
+                self._release(endpoint)
+                last_error = e
+                continue
+            if model and path in _SCHEDULED_PATHS:
+                self._mark_loaded(endpoint, model)
+            if stream:
+                # 스트림은 호출한 쪽이 다 읽은 뒤에 진행 중 요청 수를 줄임
+                return endpoint, response
+            self._release(endpoint)
+            return response
+        if isinstance(last_error, CircuitOpenError):
+            raise last_error
+        raise OllamaError(f"모든 Ollama 서버 요청이 실패했습니다: {last_error}")
+
+    def request(self, method, path, json_body=None, timeout=None, stream=False, retries=None):
+        if stream:
+            raise ValueError("라우터의 스트리밍 요청은 stream_lines를 사용하세요.")
+        if path in _SCHEDULED_PATHS:
+            with get_llm_scheduler().slot():
+                return self._send(method, path, json_body, timeout, stream, retries)
+        return self._send(method, path, json_body, timeout, stream, retries)
+
+    def stream_lines(self, path, payload):
+        # 제너레이터가 여러 스레드에서 이어 실행되므로 slot() 대신 슬롯을 직접 얻고 반환 (OllamaClient.stream_lines 참고)
+        scheduler = get_llm_scheduler()
+        scheduler.acquire()
+        try:
+            endpoint, response = self._send("POST", path, json_body=payload, stream=True)
+            response.encoding = "utf-8"
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    yield line
+            finally:
+                response.close()
+                self._release(endpoint)
+        finally:
+            scheduler.release()
+
+    def health(self):
+        """하나 이상의 서버가 응답하면 정상으로 봅니다."""
+        return any(endpoint.client.health() for endpoint in self.endpoints)
+
+    def list_models(self):
+        """모든 정상 서버에 설치된 모델을 이름 기준으로 합쳐 반환합니다."""
+        models = {}
+        last_error = None
+        for endpoint in self.endpoints:
+            try:
+                for model in endpoint.client.list_models():
+                    models.setdefault(model.get("name") or model.get("model"), model)
+            except OllamaError as e:
+                last_error = e
+        if not models and last_error is not None:
+            raise last_error
+        return list(models.values())
+
+    def show(self, model):
+        return self.request("POST", "/api/show", json_body={"model": model}, timeout=(self.connect_timeout, 10)).json()
+
+    def running_models(self):
+        """모든 서버의 상주 모델을 endpoint 항목을 붙여 반환합니다."""
+        running = []
+        for endpoint in self.endpoints:
+            try:
+                models = endpoint.client.running_models()
+            except OllamaError:
+                continue
+            with self._lock:
+                endpoint.loaded = {m.get("name") or m.get("model") for m in models}
+                endpoint.loaded_at = time.time()
+            running.extend(dict(m, endpoint=endpoint.base_url) for m in models)
+        return running
+
+    def load_model(self, model, keep_alive, embedding=False, options=None):
+        """모델이 올라와 있는 서버가 없으면 가장 한가한 정상 서버에 올립니다."""
+        last_error = None
+        for endpoint in self._candidates(model):
+            try:
+                endpoint.client.load_model(model, keep_alive, embedding=embedding, options=options)
+            except OllamaError as e:
+                last_error = e
+                continue
+            self._mark_loaded(endpoint, model)
+            return
+        raise OllamaError(f"모든 Ollama 서버에서 모델을 올리지 못했습니다: {last_error}")
+
+    def unload_model(self, model, embedding=False):
+        """모델이 올라와 있는 모든 서버에서 내립니다."""
+        key = _model_key(model)
+        for endpoint in self.endpoints:
+            if key in endpoint.loaded:
+                try:
+                    endpoint.client.unload_model(model, embedding=embedding)
+                except OllamaError:
+                    continue
+                with self._lock:
+                    endpoint.loaded.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "base_url": endpoint.base_url,
+                    "healthy": endpoint.healthy,
+                    "in_flight": endpoint.in_flight,
+                    "loaded": sorted(endpoint.loaded),
+                }
+                for endpoint in self.endpoints
+            ]
@@ -0,0 +1,145 @@
+import io
+import hashlib
+import threading
+
+from langchain_core.documents import Document
+
+from pdf_extract import get_backend
+
+
+class PdfDocument:
+    """업로드 한 건의 PDF 바이트를 한 번만 보관하고, 페이지 텍스트/이미지/메타데이터를 필요할 때 계산합니다.
+
+    미리보기, 텍스트 추출, 다운로드가 모두 같은 객체를 사용하므로 업로드당 파싱은 한 번만 일어납니다.
+    """
+
+    def __init__(self, data, name, extractor_name=None):
+        self.name = name
+        # 원본 바이트는 한 번만 보관하고 소비자에게는 복사 없는 memoryview로 제공
+        self._raw = bytes(data)
+        self.data = memoryview(self._raw)
+        self.extractor_name = extractor_name
+        self._sha256 = None
+        self._fitz_doc = None
+        self._pypdf_reader = None
+        self._page_texts = {}
+        self._lock = threading.RLock()
+
+    @property
+    def raw(self):
+        """프로세스 풀 전달이나 다운로드처럼 bytes가 꼭 필요한 곳에 쓰는 원본 바이트입니다."""
+        return self._raw
+
+    @property
+    def size(self):
+        return len(self._raw)
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    def _fitz(self):
+        # PyMuPDF 문서는 스레드 안전하지 않으므로 호출자가 잠금을 잡고 사용
+        if self._fitz_doc is None:
+            import fitz
+            self._fitz_doc = fitz.open(stream=self._raw, filetype="pdf")
+        return self._fitz_doc
+
+    def _pypdf(self):
+        if self._pypdf_reader is None:
+            from pypdf import PdfReader
+            self._pypdf_reader = PdfReader(io.BytesIO(self._raw))
+        return self._pypdf_reader
+
+    @property
+    def page_count(self):
+        with self._lock:
+            try:
+                return len(self._fitz())
+            except ImportError:
+                return len(self._pypdf().pages)
+
+    @property
+    def metadata(self):
+        with self._lock:
+            try:
+                metadata = dict(self._fitz().metadata or {})
+            except ImportError:
+                metadata = {
+                    key.lstrip("/").lower(): str(value)
+                    for key, value in (self._pypdf().metadata or {}).items()
+                }
+        metadata["page_count"] = self.page_count
+        metadata["file_size"] = self.size
+        return metadata
+
+    def page_text(self, page_num):
+        """페이지 텍스트 (0부터 시작하는 페이지 번호, 한 번 추출하면 재사용)."""
+        with self._lock:
+            if page_num not in self._page_texts:
+                backend = get_backend(self.extractor_name)
+                if backend.name == "pymupdf":
+                    text = self._fitz().load_page(page_num).get_text() or ""
+                else:
+                    text = self._pypdf().pages[page_num].extract_text() or ""
+                self._page_texts[page_num] = text
+            return self._page_texts[page_num]
+
+    def set_extractor(self, extractor_name):
+        """텍스트 추출 백엔드를 바꾸면 이전 백엔드로 추출한 텍스트는 버립니다."""
+        with self._lock:
+            if extractor_name != self.extractor_name:
+                self.extractor_name = extractor_name
+                self._page_texts.clear()
+
+    def set_page_texts(self, page_texts):
+        """다른 경로(예: 병렬 추출)에서 이미 얻은 (페이지 번호, 텍스트)를 등록합니다."""
+        with self._lock:
+            for page_num, text in page_texts:
+                self._page_texts.setdefault(page_num, text)
+
+    def page_image(self, page_num, zoom=1.2):
+        """페이지를 PNG 바이트로 렌더링합니다."""
+        import fitz
+        with self._lock:
+            page = self._fitz().load_page(page_num)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            return pix.tobytes("png")
+
+    def to_documents(self):
+        """페이지별 LangChain Document 목록을 반환합니다 (PyPDFLoader.load()와 같은 메타데이터 형식)."""
+        return [
+            Document(page_content=self.page_text(i), metadata={"source": self.name, "page": i})
+            for i in range(self.page_count)
+        ]
+
+    def close(self):
+        with self._lock:
+            if self._fitz_doc is not None:
+                self._fitz_doc.close()
+                self._fitz_doc = None
+            self._pypdf_reader = None
+            self._page_texts.clear()
+
+
+def _upload_id(uploaded_file):
+    return getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+
+
+def get_upload_document(uploaded_file, state, extractor_name=None):
+    """세션 상태(state)에 현재 업로드의 PdfDocument를 하나만 유지하고 반환합니다."""
+    upload_id = _upload_id(uploaded_file)
+    cached = state.get("pdf_document")
+    if cached is not None and cached[0] == upload_id:
+        document = cached[1]
+        if extractor_name is not None:
+            document.set_extractor(extractor_name)
+        return document
+
+    if cached is not None:
+        cached[1].close()
+    document = PdfDocument(uploaded_file.getvalue(), uploaded_file.name, extractor_name)
+    state["pdf_document"] = (upload_id, document)
+    return document
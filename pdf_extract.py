@@ -0,0 +1,279 @@
+import io
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+# 병렬 추출 설정
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+# 텍스트 추출 백엔드 (pypdf, pymupdf, auto)
+PDF_TEXT_BACKEND = os.environ.get("PDF_TEXT_BACKEND", "pypdf")
+# 이보다 페이지 수가 적으면 프로세스 간 전송 비용이 더 커서 직렬로 추출
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "32"))
+
+# 페이지 번호(0부터)와 전체 텍스트 안에서의 문자 오프셋 [start, end)
+PageText = namedtuple("PageText", ["page", "text", "start", "end"])
+
+
+class PypdfBackend:
+    """pypdf 기반 텍스트 추출 (순수 파이썬, 설치 부담이 적음)."""
+
+    name = "pypdf"
+
+    def page_count(self, pdf_bytes):
+        return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+    def extract_range(self, pdf_bytes, start, stop):
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        return [(i, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+class PymupdfBackend:
+    """PyMuPDF(fitz) 기반 텍스트 추출 (C 구현이라 대체로 더 빠름)."""
+
+    name = "pymupdf"
+
+    def page_count(self, pdf_bytes):
+        import fitz
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            return len(doc)
+
+    def extract_range(self, pdf_bytes, start, stop):
+        import fitz
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            return [(i, doc.load_page(i).get_text() or "") for i in range(start, stop)]
+
+
+EXTRACTION_BACKENDS = {
+    PypdfBackend.name: PypdfBackend,
+    PymupdfBackend.name: PymupdfBackend,
+}
+
+
+def _pymupdf_available():
+    try:
+        import fitz  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_backend(name=None):
+    """이름으로 추출 백엔드를 반환합니다. 'auto'는 PyMuPDF가 있으면 PyMuPDF를 사용합니다."""
+    name = (name or PDF_TEXT_BACKEND).lower()
+    if name == "auto":
+        name = PymupdfBackend.name if _pymupdf_available() else PypdfBackend.name
+    if name not in EXTRACTION_BACKENDS:
+        raise ValueError(
+            f"알 수 없는 PDF 추출 백엔드: {name} (사용 가능: {', '.join(EXTRACTION_BACKENDS)}, auto)"
+        )
+    return EXTRACTION_BACKENDS[name]()
+
+
+def _extract_shard(backend_name, pdf_bytes, start, stop):
+    """워커 프로세스에서 [start, stop) 범위 페이지의 텍스트를 추출합니다."""
+    return get_backend(backend_name).extract_range(pdf_bytes, start, stop)
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    # 스트림릿 서버의 스레드 상태를 복제하지 않도록 spawn 방식으로 워커를 띄움
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _shard_ranges(page_count, shards):
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def assemble_pages(page_texts):
+    """(페이지 번호, 텍스트) 목록을 한 번에 이어 붙이고 페이지별 오프셋을 계산합니다."""
+    pages = []
+    offset = 0
+    for page_num, text in sorted(page_texts):
+        pages.append(PageText(page_num, text, offset, offset + len(text)))
+        offset += len(text)
+    full_text = "".join(page.text for page in pages)
+    return full_text, pages
+
+
+def extract_pages(pdf_bytes, workers=None, backend=None):
+    """PDF 페이지 텍스트를 프로세스 풀에 나눠 추출하고 (전체 텍스트, PageText 목록)을 반환합니다."""
+    workers = max(1, workers or PDF_EXTRACT_WORKERS)
+    extractor = get_backend(backend)
+    page_count = extractor.page_count(pdf_bytes)
+
+    if workers == 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        return assemble_pages(extractor.extract_range(pdf_bytes, 0, page_count))
+
+    ranges = _shard_ranges(page_count, min(workers, page_count))
+    pool = _get_pool(workers)
+    futures = [
+        pool.submit(_extract_shard, extractor.name, pdf_bytes, start, stop)
+        for start, stop in ranges
+    ]
+
+    page_texts = []
+    for future in futures:
+        page_texts.extend(future.result())
+    return assemble_pages(page_texts)
+
+
+def iter_page_batches(pdf_bytes, batch_pages=8, workers=None, backend=None):
+    """페이지 순서대로 (페이지 번호, 텍스트) 묶음을 생성합니다. 큰 문서는 뒤쪽 페이지를 미리 병렬 추출합니다."""
+    workers = max(1, workers or PDF_EXTRACT_WORKERS)
+    batch_pages = max(1, batch_pages)
+    extractor = get_backend(backend)
+    page_count = extractor.page_count(pdf_bytes)
+
+    if workers == 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        for start in range(0, page_count, batch_pages):
+            yield extractor.extract_range(pdf_bytes, start, min(start + batch_pages, page_count))
+        return
+
+    # 나머지 페이지는 extract_pages처럼 워커마다 한 구간씩 맡김 (워커마다 PDF 전송과 파싱은 한 번)
+    first_stop = min(batch_pages, page_count)
+    ranges = _shard_ranges(page_count - first_stop, min(workers, page_count - first_stop))
+    pool = _get_pool(workers)
+    futures = [
+        pool.submit(_extract_shard, extractor.name, pdf_bytes, first_stop + start, first_stop + stop)
+        for start, stop in ranges
+    ]
+    try:
+        # 첫 묶음은 바로 인덱싱을 시작할 수 있도록 이 프로세스에서 추출
+        yield extractor.extract_range(pdf_bytes, 0, first_stop)
+        for future in futures:
+            page_texts = future.result()
+            for start in range(0, len(page_texts), batch_pages):
+                yield page_texts[start:start + batch_pages]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS는 바이트, 리눅스는 KB 단위로 보고함
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _benchmark_backend(backend_name, paths, workers):
+    """별도 프로세스에서 한 백엔드를 측정합니다 (백엔드끼리 메모리 측정이 섞이지 않도록)."""
+    tracemalloc.start()
+    baseline_rss = _peak_rss_kb()
+    pages = 0
+    chars = 0
+    elapsed = 0.0
+    errors = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        started = time.perf_counter()
+        try:
+            text, page_texts = extract_pages(pdf_bytes, workers=workers, backend=backend_name)
+        except Exception as e:
+            errors.append(f"{os.path.basename(path)}: {e}")
+            continue
+        elapsed += time.perf_counter() - started
+        pages += len(page_texts)
+        chars += len(text)
+    _, peak_py = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = _peak_rss_kb()
+    return {
+        "backend": backend_name,
+        "files": len(paths) - len(errors),
+        "pages": pages,
+        "chars": chars,
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed if elapsed > 0 else 0.0,
+        "peak_python_mb": peak_py / (1024 * 1024),
+        "peak_rss_growth_mb": (
+            (peak_rss - baseline_rss) / 1024 if peak_rss is not None and baseline_rss is not None else None
+        ),
+        "errors": errors,
+    }
+
+
+def run_benchmark(folder, backends=None, workers=1):
+    """폴더 안의 PDF들로 백엔드별 pages/sec, 최대 메모리, 추출 문자 수를 측정합니다."""
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(".pdf")
+    )
+    if not paths:
+        raise ValueError(f"{folder}에 PDF 파일이 없습니다.")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for backend_name in backends or list(EXTRACTION_BACKENDS):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as runner:
+            results.append(runner.submit(_benchmark_backend, backend_name, paths, workers).result())
+    return results
+
+
+def _print_benchmark(results):
+    header = f"{'backend':<10} {'files':>5} {'pages':>7} {'pages/s':>9} {'chars':>11} {'py peak MB':>11} {'RSS +MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        rss = f"{r['peak_rss_growth_mb']:.1f}" if r["peak_rss_growth_mb"] is not None else "n/a"
+        print(
+            f"{r['backend']:<10} {r['files']:>5} {r['pages']:>7} {r['pages_per_sec']:>9.1f} "
+            f"{r['chars']:>11} {r['peak_python_mb']:>11.1f} {rss:>9}"
+        )
+    for r in results:
+        for error in r["errors"]:
+            print(f"[{r['backend']}] 실패 - {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF 텍스트 추출 백엔드 벤치마크")
+    parser.add_argument("folder", help="PDF 파일이 들어 있는 폴더")
+    parser.add_argument(
+        "--backends",
+        default=",".join(EXTRACTION_BACKENDS),
+        help="쉼표로 구분한 백엔드 목록 (기본: 전체)"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="추출 프로세스 수 (기본: 1)")
+    args = parser.parse_args()
+
+    _print_benchmark(
+        run_benchmark(
+            args.folder,
+            backends=[name.strip() for name in args.backends.split(",") if name.strip()],
+            workers=args.workers
+        )
+    )
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+# 재구성 결과를 보관하는 개수와, 대화 기록이 있어도 재구성하는 짧은 질문의 길이(글자 수)
+QUERY_REWRITE_MEMO_SIZE = int(os.environ.get("QUERY_REWRITE_MEMO_SIZE", "512"))
+QUERY_REWRITE_SHORT_CHARS = int(os.environ.get("QUERY_REWRITE_SHORT_CHARS", "8"))
+# 재구성하는 동안 원래 질문으로 미리 검색해 두기 (재구성 결과가 같으면 바로 사용)
+QUERY_REWRITE_SPECULATIVE = os.environ.get("QUERY_REWRITE_SPECULATIVE", "1") == "1"
+
+# 앞선 대화를 가리키는 지시어·접속어 (이 단어로 시작하는 어절이 있으면 재구성)
+_KOREAN_ANAPHORA_PREFIXES = (
+    "그것", "그거", "그건", "그게", "그걸", "그분", "그곳", "그때", "그럼", "그러면", "그렇다면",
+    "이것", "이거", "이건", "이게", "이걸", "저것", "저거", "거기", "여기",
+    "해당", "위의", "앞서", "앞의", "방금", "아까", "이전", "또", "다른",
+)
+_KOREAN_ANAPHORA_WORDS = {"그", "이", "저", "위", "더"}
+_ENGLISH_ANAPHORA_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their",
+    "he", "she", "his", "her", "above", "previous", "same", "also", "else", "more",
+}
+_WORD_RE = re.compile(r"[0-9A-Za-z가-힣]+")
+
+
+def has_anaphora(question):
+    """질문이 앞선 대화에 기대는 표현(지시어, 접속어, 생략된 짧은 질문)을 포함하는지 확인합니다."""
+    stripped = question.strip()
+    if len(stripped) <= QUERY_REWRITE_SHORT_CHARS:
+        return True
+    for word in _WORD_RE.findall(stripped):
+        lower = word.lower()
+        if lower in _ENGLISH_ANAPHORA_WORDS or word in _KOREAN_ANAPHORA_WORDS:
+            return True
+        if word.startswith(_KOREAN_ANAPHORA_PREFIXES):
+            return True
+    return False
+
+
+def _message_fields(message):
+    if isinstance(message, dict):
+        return message.get("role"), message.get("content")
+    if isinstance(message, (tuple, list)):
+        return message[0], message[1]
+    return getattr(message, "type", None), getattr(message, "content", None)
+
+
+def prior_history(question, chat_history):
+    """대화 기록 끝에 현재 질문이 이미 들어 있으면 빼고 이전 대화만 반환합니다."""
+    history = list(chat_history or [])
+    if history:
+        role, content = _message_fields(history[-1])
+        if role in ("user", "human") and content == question:
+            history = history[:-1]
+    return history
+
+
+def history_hash(chat_history):
+    serialized = json.dumps([_message_fields(m) for m in chat_history], ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class RewriteMemo:
+    """(대화 기록 해시, 질문)별 재구성 결과를 보관하는 LRU입니다."""
+
+    def __init__(self, max_entries=QUERY_REWRITE_MEMO_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_rewrite_memo = RewriteMemo()
+_speculative_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculative-retrieval")
+
+
+def _normalize_question(text):
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def create_conditional_history_aware_retriever(llm, retriever, prompt, speculative=QUERY_REWRITE_SPECULATIVE):
+    """create_history_aware_retriever와 같은 입력({"input", "chat_history"})을 받아 문서를 돌려주는 검색기입니다.
+
+    이전 대화가 없거나 질문에 앞선 대화를 가리키는 표현이 없으면 LLM 재구성을 건너뛰고,
+    재구성 결과는 (대화 기록 해시, 질문)별로 재사용합니다.
+    """
+    rewrite_chain = prompt | llm | StrOutputParser()
+
+    def retrieve(inputs, config):
+        question = inputs["input"]
+        history = prior_history(question, inputs.get("chat_history"))
+        if not history or not has_anaphora(question):
+            return retriever.invoke(question, config)
+
+        key = (history_hash(history), question)
+        rewritten = _rewrite_memo.get(key)
+        if rewritten is not None:
+            return retriever.invoke(rewritten, config)
+
+        # 재구성 LLM 호출 동안 원래 질문으로 미리 검색 (스케줄러 컨텍스트 유지)
+        future = None
+        if speculative:
+            future = _speculative_executor.submit(
+                contextvars.copy_context().run, retriever.invoke, question
+            )
+        rewritten = rewrite_chain.invoke({"input": question, "chat_history": history}, config).strip() or question
+        _rewrite_memo.put(key, rewritten)
+
+        if future is not None:
+            if _normalize_question(rewritten) == _normalize_question(question):
+                return future.result()
+            future.cancel()
+        return retriever.invoke(rewritten, config)
+
+    return RunnableLambda(retrieve).with_config(run_name="chat_retriever_chain")
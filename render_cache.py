@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+
+# 렌더링된 페이지 이미지 캐시 용량 (MB)
+PAGE_RENDER_CACHE_MB = int(os.environ.get("PAGE_RENDER_CACHE_MB", "256"))
+
+
+class PageRenderCache:
+    """(문서 해시, 페이지, 배율)별 렌더링 결과를 바이트 예산 안에서 LRU로 보관합니다."""
+
+    def __init__(self, max_bytes=PAGE_RENDER_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        # 예산보다 큰 단일 항목은 캐시하지 않음
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def render_page(self, document, page_num, zoom):
+        """캐시에 없을 때만 문서에서 페이지를 렌더링합니다."""
+        key = (document.sha256, page_num, round(float(zoom), 3))
+        image = self.get(key)
+        if image is None:
+            image = document.page_image(page_num, zoom=zoom)
+            self.put(key, image)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_page_render_cache = None
+_page_render_cache_lock = threading.Lock()
+
+
+def get_page_render_cache():
+    """프로세스 전체에서 공유하는 페이지 렌더링 캐시를 반환합니다."""
+    global _page_render_cache
+    with _page_render_cache_lock:
+        if _page_render_cache is None:
+            _page_render_cache = PageRenderCache()
+        return _page_render_cache
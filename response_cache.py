@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from langchain_core.caches import BaseCache
+from langchain_core.outputs import Generation
+
+# LLM 응답 캐시 경로, 유효 기간(초), 용량 상한(MB)
+RESPONSE_CACHE_PATH = os.environ.get(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "streamlit_test1", "responses.sqlite3")
+)
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_MB = int(os.environ.get("RESPONSE_CACHE_MAX_MB", "64"))
+
+
+def llm_string_for(llm, stop=None):
+    """LangChain이 LLM 캐시 키로 쓰는 문자열을 같은 방식(모델, 생성 옵션, stop)으로 만듭니다."""
+    params = llm.dict()
+    params["stop"] = stop
+    return str(sorted([(k, v) for k, v in params.items()]))
+
+
+class ResponseCache(BaseCache):
+    """(모델·생성 옵션, 렌더링된 프롬프트)를 키로 LLM 응답을 저장하는 SQLite 캐시입니다.
+
+    검색된 청크는 렌더링된 프롬프트에 그대로 들어가므로 같은 청크가 검색될 때만 적중합니다.
+    set_llm_cache로 등록하면 체인 안의 LLM 호출(generate)에 자동으로 적용되고,
+    .stream()처럼 캐시를 거치지 않는 경로에서는 CachedStream을 사용합니다.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL, max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                generations TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return [Generation(text=text) for text in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        texts = [generation.text for generation in return_val]
+        # 빈 응답(중단·오류)은 저장하지 않음
+        if not any(texts):
+            return
+        payload = json.dumps(texts, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, generations, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self._key(prompt, llm_string), payload, size, now, now)
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now):
+        """만료된 항목을 지우고, 용량 상한을 넘으면 오래 쓰지 않은 항목부터 지웁니다."""
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class CachedStream:
+    """llm.stream(prompt)과 같지만, 캐시에 있으면 저장된 응답을 한 번에 내보내고 없으면 생성 후 저장합니다.
+
+    .stream()은 LangChain의 LLM 캐시를 거치지 않으므로 일반 LLM 경로에서 사용합니다.
+    반복을 시작한 뒤 hit에 캐시 적중 여부가 담깁니다.
+    """
+
+    def __init__(self, llm, prompt, cache=None):
+        self.llm = llm
+        self.prompt = prompt
+        self.cache = cache or get_response_cache()
+        self.hit = False
+
+    def __iter__(self):
+        llm_string = llm_string_for(self.llm)
+        cached = self.cache.lookup(self.prompt, llm_string)
+        if cached is not None:
+            self.hit = True
+            yield "".join(generation.text for generation in cached)
+            return
+
+        parts = []
+        for token in self.llm.stream(self.prompt):
+            parts.append(token)
+            yield token
+        # 끝까지 생성된 응답만 저장 (중간에 멈추면 GeneratorExit로 여기까지 오지 않음)
+        self.cache.update(self.prompt, llm_string, [Generation(text="".join(parts))])
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """프로세스 전체에서 공유하는 LLM 응답 캐시를 반환합니다."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 이전 질문과의 코사인 유사도가 이 값 이상이면 저장된 답변을 재사용
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# 문서당 보관할 질문 수와 보관할 문서 수
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+SEMANTIC_CACHE_MAX_DOCUMENTS = int(os.environ.get("SEMANTIC_CACHE_MAX_DOCUMENTS", "64"))
+
+
+class _DocumentAnswers:
+    """한 문서에 대해 받은 질문 벡터(정규화)와 답변 목록입니다."""
+
+    def __init__(self):
+        self.vectors = None
+        self.questions = []
+        self.answers = []
+
+    def search(self, vector):
+        if self.vectors is None:
+            return None, 0.0
+        scores = self.vectors @ vector
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def add(self, question, vector, answer, max_entries):
+        row = vector[np.newaxis, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        self.questions.append(question)
+        self.answers.append(answer)
+        # 가장 오래된 질문부터 버림
+        if len(self.questions) > max_entries:
+            overflow = len(self.questions) - max_entries
+            self.vectors = self.vectors[overflow:]
+            self.questions = self.questions[overflow:]
+            self.answers = self.answers[overflow:]
+
+
+class SemanticAnswerCache:
+    """문서별로 이전 질문을 임베딩해 두고, 표현만 다른 같은 질문이 오면 저장된 답변을 돌려줍니다."""
+
+    def __init__(
+        self,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        max_documents=SEMANTIC_CACHE_MAX_DOCUMENTS,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, document_key, question_vector, threshold=None):
+        """임계값 이상으로 비슷한 이전 질문이 있으면 (답변, 이전 질문, 유사도)를, 없으면 None을 반환합니다."""
+        threshold = self.threshold if threshold is None else threshold
+        vector = self._normalize(question_vector)
+        with self._lock:
+            answers = self._documents.get(document_key)
+            if answers is not None:
+                self._documents.move_to_end(document_key)
+                index, score = answers.search(vector)
+                if index is not None and score >= threshold:
+                    self.hits += 1
+                    return answers.answers[index], answers.questions[index], score
+            self.misses += 1
+            return None
+
+    def add(self, document_key, question, question_vector, answer):
+        vector = self._normalize(question_vector)
+        with self._lock:
+            answers = self._documents.get(document_key)
+            if answers is None:
+                answers = self._documents[document_key] = _DocumentAnswers()
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+            self._documents.move_to_end(document_key)
+            answers.add(question, vector, answer, self.max_entries)
+
+    def discard(self, document_key):
+        with self._lock:
+            self._documents.pop(document_key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "entries": sum(len(a.questions) for a in self._documents.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_semantic_answer_cache = None
+_semantic_answer_cache_lock = threading.Lock()
+
+
+def get_semantic_answer_cache():
+    """프로세스 전체에서 공유하는 의미 기반 답변 캐시를 반환합니다."""
+    global _semantic_answer_cache
+    with _semantic_answer_cache_lock:
+        if _semantic_answer_cache is None:
+            _semantic_answer_cache = SemanticAnswerCache()
+        return _semantic_answer_cache
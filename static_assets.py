@@ -0,0 +1,121 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+import uuid
+
+# Streamlit 정적 파일 서빙 디렉터리 (.streamlit/config.toml의 enableStaticServing 필요)
+# 메인 스크립트와 같은 폴더의 static/ 아래 파일이 app/static/ 경로로 제공됨
+# Streamlit 1.32 정적 핸들러는 이미지(.png/.jpg/.gif/.webp)만 제대로 된 Content-Type으로 보내고
+# 나머지는 text/plain + nosniff로 보내므로, 여기에는 렌더링된 페이지 PNG만 저장함 (원본 PDF는 다운로드 버튼으로 제공)
+# 주의: 저장된 페이지 이미지는 URL(문서 SHA-256 포함)을 아는 누구나 인증 없이 받을 수 있으므로
+# 오래 쓰지 않은 문서는 STATIC_ASSET_MAX_AGE_HOURS가 지나면 지우고, 전체 용량은 STATIC_ASSET_CACHE_MB로 제한함
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL_PREFIX = "app/static"
+STATIC_CACHE_SUBDIR = "cache"
+STATIC_ASSET_CACHE_MB = int(os.environ.get("STATIC_ASSET_CACHE_MB", "1024"))
+STATIC_ASSET_MAX_AGE_HOURS = float(os.environ.get("STATIC_ASSET_MAX_AGE_HOURS", "24"))
+# 정적 디렉터리에 남겨 두는 파일 확장자 (이외의 파일, 예: 이전 버전이 저장한 document.pdf는 정리할 때 삭제)
+STATIC_ASSET_EXTENSIONS = (".png",)
+
+
+class StaticAssetStore:
+    """렌더링된 페이지 PNG를 정적 디렉터리에 한 번만 쓰고 URL로 참조하게 합니다.
+
+    파일 이름이 내용(문서 해시, 페이지, 배율)으로 정해지므로 URL의 ?v= 값은 바뀌지 않으며,
+    Tornado 정적 핸들러는 ?v=가 붙은 요청에 장기 캐시 헤더를 붙여 브라우저가 한 번만 내려받습니다.
+    """
+
+    def __init__(self, root=STATIC_DIR, max_bytes=STATIC_ASSET_CACHE_MB * 1024 * 1024,
+                 max_age_seconds=STATIC_ASSET_MAX_AGE_HOURS * 3600):
+        self.root = root
+        self.cache_dir = os.path.join(root, STATIC_CACHE_SUBDIR)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 시작할 때 이전 실행이 남긴 오래된 문서와 이미지가 아닌 파일을 정리
+        self._evict()
+
+    def _url(self, relpath, version):
+        return f"{STATIC_URL_PREFIX}/{STATIC_CACHE_SUBDIR}/{relpath}?v={version}"
+
+    def _write_once(self, relpath, data):
+        path = os.path.join(self.cache_dir, relpath)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict(keep=relpath.split("/", 1)[0])
+        # 문서 디렉터리의 수정 시각을 마지막 사용 시각(LRU 기준)으로 사용
+        os.utime(os.path.dirname(path))
+        return path
+
+    def has(self, relpath):
+        return os.path.exists(os.path.join(self.cache_dir, relpath))
+
+    def page_image_url(self, document, page_num, zoom, render_cache=None):
+        """페이지 PNG를 정적 디렉터리에 저장하고 URL을 반환합니다 (이미 있으면 렌더링하지 않음)."""
+        zoom = round(float(zoom), 3)
+        relpath = f"{document.sha256}/page-{page_num + 1}@{zoom}.png"
+        if self.has(relpath):
+            os.utime(os.path.join(self.cache_dir, document.sha256))
+        else:
+            if render_cache is not None:
+                image = render_cache.render_page(document, page_num, zoom)
+            else:
+                image = document.page_image(page_num, zoom=zoom)
+            self._write_once(relpath, image)
+        version = hashlib.sha256(relpath.encode("utf-8")).hexdigest()[:16]
+        return self._url(relpath, version)
+
+    def _evict(self, keep=None):
+        """오래 사용하지 않은 문서 디렉터리를 지우고, 용량 상한을 넘으면 가장 오래된 것부터 삭제합니다."""
+        with self._lock:
+            entries = []
+            total = 0
+            expires = time.time() - self.max_age_seconds
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if not os.path.isdir(path):
+                    continue
+                if name != keep and os.path.getmtime(path) < expires:
+                    shutil.rmtree(path, ignore_errors=True)
+                    continue
+                size = 0
+                for f in os.listdir(path):
+                    file_path = os.path.join(path, f)
+                    # 다른 스레드가 쓰는 중인 임시 파일은 건드리지 않음
+                    if not os.path.isfile(file_path) or f.endswith(".tmp"):
+                        continue
+                    if not f.endswith(STATIC_ASSET_EXTENSIONS):
+                        os.remove(file_path)
+                        continue
+                    size += os.path.getsize(file_path)
+                total += size
+                entries.append((os.path.getmtime(path), name, path, size))
+
+            entries.sort()
+            for _, name, path, size in entries:
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+_static_asset_store = None
+_static_asset_store_lock = threading.Lock()
+
+
+def get_static_asset_store():
+    """프로세스 전체에서 공유하는 정적 자산 저장소를 반환합니다."""
+    global _static_asset_store
+    with _static_asset_store_lock:
+        if _static_asset_store is None:
+            _static_asset_store = StaticAssetStore()
+        return _static_asset_store
@@ -0,0 +1,251 @@
+import os
+import time
+import queue
+import threading
+import contextvars
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from llm_scheduler import request_context
+
+# 질문 재구성 등 다른 LLM 호출과 구분하기 위해 답변 생성 LLM에 붙이는 태그
+ANSWER_STREAM_TAG = "answer_stream"
+
+# 스트리밍 토큰을 화면에 반영하는 최소 간격(ms)과 최대 누적 토큰 수
+STREAM_RENDER_INTERVAL_MS = int(os.environ.get("STREAM_RENDER_INTERVAL_MS", "50"))
+STREAM_RENDER_MAX_TOKENS = int(os.environ.get("STREAM_RENDER_MAX_TOKENS", "32"))
+
+_DONE = object()
+
+
+class _QueuePosition(int):
+    """작업 스레드에서 호출 스레드로 전달하는 스케줄러 대기 순서입니다."""
+
+
+class StreamTimer:
+    """스트리밍 응답의 첫 토큰까지 걸린 시간(TTFT)과 전체 생성 시간을 측정합니다."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.tokens = 0
+
+    def mark_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started
+
+    def summary(self):
+        if self.time_to_first_token is None:
+            return f"⏱ 전체 {self.elapsed:.1f}s"
+        return f"⏱ 첫 토큰 {self.time_to_first_token:.2f}s · 전체 {self.elapsed:.1f}s · 토큰 {self.tokens}개"
+
+
+class ThrottledMarkdown:
+    """스트리밍 토큰을 모아 일정 간격(또는 N 토큰)마다 한 번씩만 placeholder를 다시 그립니다.
+
+    토큰마다 전체 마크다운을 다시 보내면 렌더링 비용이 답변 길이의 제곱으로 늘어나므로,
+    프레임 단위로 합쳐 웹소켓 전송과 브라우저 렌더링 횟수를 제한합니다.
+    """
+
+    def __init__(
+        self,
+        placeholder,
+        interval_ms=STREAM_RENDER_INTERVAL_MS,
+        max_tokens=STREAM_RENDER_MAX_TOKENS,
+        cursor="▌",
+    ):
+        self.placeholder = placeholder
+        self.interval = interval_ms / 1000.0
+        self.max_tokens = max_tokens
+        self.cursor = cursor
+        self.frames = 0
+        self._parts = []
+        self._text = ""
+        self._pending = 0
+        self._last_render = 0.0
+
+    @property
+    def text(self):
+        if self._pending:
+            self._text += "".join(self._parts)
+            self._parts = []
+            self._pending = 0
+        return self._text
+
+    def append(self, token):
+        self._parts.append(token)
+        self._pending += 1
+        now = time.perf_counter()
+        if (
+            now - self._last_render >= self.interval
+            or (self.max_tokens and self._pending >= self.max_tokens)
+        ):
+            self._render(self.text + self.cursor, now)
+
+    def _render(self, content, now=None):
+        self.placeholder.markdown(content)
+        self.frames += 1
+        self._last_render = now or time.perf_counter()
+
+    def finish(self, text=None):
+        """커서 없이 최종 텍스트를 한 번 그리고 반환합니다."""
+        if text is not None:
+            self._parts = []
+            self._pending = 0
+            self._text = text
+        final_text = self.text
+        self._render(final_text)
+        return final_text
+
+
+def queue_position_notifier(placeholder, cursor="▌"):
+    """스케줄러 대기 순서를 placeholder에 표시하는 on_wait 콜백을 만듭니다 (0이면 대기 종료).
+
+    스트림릿 요소는 만든 스레드에서만 그릴 수 있으므로 다른 스레드에서의 호출은 무시합니다.
+    작업 스레드의 대기 순서는 stream_retrieval_chain이나 CallbackStream에 넘겨 큐를 거쳐 표시합니다.
+    """
+    owner = threading.current_thread()
+
+    def on_wait(position):
+        if threading.current_thread() is not owner:
+            return
+        if position > 0:
+            placeholder.markdown(f"⏳ 다른 요청을 처리하는 중입니다. 대기 순서: {position}번째")
+        else:
+            placeholder.markdown(cursor)
+    return on_wait
+
+
+def timed_tokens(tokens, timer):
+    """토큰 이터레이터를 감싸 TTFT와 토큰 수를 기록합니다."""
+    try:
+        for token in tokens:
+            if token:
+                timer.mark_token()
+                yield token
+    finally:
+        timer.finish()
+
+
+def stream_retrieval_chain(rag_chain, inputs, timer, on_wait=None):
+    """create_retrieval_chain으로 만든 체인을 스트리밍하여 ("context", 문서 목록) 또는 ("token", 문자열)을 생성합니다.
+
+    LCEL은 LLM 호출을 실행기 스레드에서 하므로 체인은 작업 스레드에서 돌리고, 결과 조각과
+    스케줄러 대기 순서는 큐로 받아 호출 스레드에서 내보내거나 on_wait로 표시합니다.
+    """
+    items = queue.Queue()
+    errors = []
+
+    def target():
+        try:
+            with request_context(on_wait=lambda position: items.put(_QueuePosition(position))):
+                for chunk in rag_chain.stream(inputs):
+                    if "context" in chunk:
+                        items.put(("context", chunk["context"]))
+                    if "answer" in chunk and chunk["answer"]:
+                        items.put(("token", chunk["answer"]))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            items.put(_DONE)
+
+    # 호출한 세션의 스케줄러 컨텍스트(세션, 우선순위)를 작업 스레드로 전달
+    context = contextvars.copy_context()
+    worker = threading.Thread(target=context.run, args=(target,), name="llm-stream", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _QueuePosition):
+                if on_wait is not None:
+                    on_wait(int(item))
+                continue
+            kind, value = item
+            if kind == "token":
+                timer.mark_token()
+            yield kind, value
+    finally:
+        worker.join()
+        timer.finish()
+    if errors:
+        raise errors[0]
+
+
+class TokenQueueHandler(BaseCallbackHandler):
+    """태그가 일치하는 LLM 호출의 새 토큰을 큐에 넣는 콜백 핸들러입니다."""
+
+    def __init__(self, token_queue, tag=None):
+        self.token_queue = token_queue
+        self.tag = tag
+
+    def on_llm_new_token(self, token, *, tags=None, **kwargs):
+        if self.tag is None or self.tag in (tags or []):
+            self.token_queue.put(token)
+
+
+class CallbackStream:
+    """콜백 기반(레거시 Chain) 호출을 백그라운드 스레드에서 실행하며 토큰을 순서대로 내보냅니다.
+
+    반복이 끝나면 result에 체인의 최종 반환값이 담기고, 실행 중 예외는 반복 중에 다시 발생합니다.
+    """
+
+    def __init__(self, run, timer, tag=ANSWER_STREAM_TAG, on_wait=None):
+        self._run = run
+        self.timer = timer
+        self.tag = tag
+        self.on_wait = on_wait
+        self.result = None
+        self._error = None
+        self._queue = queue.Queue()
+
+    def _target(self):
+        try:
+            handler = TokenQueueHandler(self._queue, self.tag)
+            # 대기 순서 알림도 큐를 거쳐 호출 스레드에서 표시 (작업 스레드에서는 화면을 건드리지 않음)
+            with request_context(on_wait=lambda position: self._queue.put(_QueuePosition(position))):
+                self.result = self._run([handler])
+        except Exception as e:
+            self._error = e
+        finally:
+            self._queue.put(_DONE)
+
+    def __iter__(self):
+        # 스트림릿 요소는 호출 스레드에서만 갱신하고, 작업 스레드는 체인 실행만 담당
+        # 호출한 세션의 스케줄러 컨텍스트(세션, 우선순위, 대기열 알림)를 작업 스레드로 전달
+        context = contextvars.copy_context()
+        worker = threading.Thread(target=context.run, args=(self._target,), name="llm-stream", daemon=True)
+        worker.start()
+        try:
+            while True:
+                token = self._queue.get()
+                if token is _DONE:
+                    break
+                if isinstance(token, _QueuePosition):
+                    if self.on_wait is not None:
+                        self.on_wait(int(token))
+                    continue
+                if token:
+                    self.timer.mark_token()
+                    yield token
+        finally:
+            worker.join()
+            self.timer.finish()
+        if self._error is not None:
+            raise self._error
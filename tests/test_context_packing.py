@@ -0,0 +1,70 @@
+from langchain_core.documents import Document
+
+from context_packing import context_budget_tokens, pack_documents
+from inference_profiles import estimate_tokens, retrieval_context_tokens
+
+
+def _chunk(text, page=0, start=None, source="contract.pdf"):
+    metadata = {"source": source, "page": page}
+    if start is not None:
+        metadata["start_index"] = start
+    return Document(page_content=text, metadata=metadata)
+
+
+PAGE = (
+    "제1조 본 계약은 갑과 을 사이의 용역 계약이다. "
+    "제2조 계약 기간은 2024년 1월 1일부터 12월 31일까지로 한다. "
+    "제3조 계약 금액은 총 7,000만 원으로 한다."
+)
+
+
+def test_overlapping_chunks_are_merged_by_offset():
+    first = PAGE[:70]
+    second = PAGE[40:]
+    packed, report = pack_documents([_chunk(second, start=40), _chunk(first, start=0)], max_tokens=1000)
+
+    assert len(packed) == 1
+    assert packed[0].page_content == PAGE
+    assert packed[0].metadata["merged_chunks"] == 2
+    assert packed[0].metadata["start_index"] == 0
+    assert report.chunks_in == 2 and report.chunks_out == 1
+    assert report.tokens_saved == report.input_tokens - report.packed_tokens > 0
+
+
+def test_overlapping_chunks_without_offsets_are_merged_by_text():
+    first = PAGE[:70]
+    second = PAGE[30:]
+    packed, _ = pack_documents([_chunk(first), _chunk(second)], max_tokens=1000)
+    assert [doc.page_content for doc in packed] == [PAGE]
+
+
+def test_repeated_sentences_are_dropped_from_lower_ranked_chunks():
+    sentence = "제2조 계약 기간은 2024년 1월 1일부터 12월 31일까지로 한다."
+    packed, _ = pack_documents(
+        [_chunk(f"{sentence} 갑은 대금을 지급한다.", page=1), _chunk(f"{sentence} 을은 용역을 수행한다.", page=5)],
+        max_tokens=1000
+    )
+    assert sentence in packed[0].page_content
+    assert packed[1].page_content == "을은 용역을 수행한다."
+
+
+def test_packing_respects_the_token_budget_in_rank_order():
+    chunks = [
+        _chunk(" ".join(f"{page}쪽 {line}번째 줄의 계약 내용입니다." for line in range(40)), page=page)
+        for page in range(4)
+    ]
+    packed, report = pack_documents(chunks, max_tokens=300)
+
+    assert report.packed_tokens <= 300
+    assert packed[0].metadata["page"] == 0
+    assert [doc.metadata["page"] for doc in packed] == sorted(doc.metadata["page"] for doc in packed)
+    assert report.chunks_out < report.chunks_in
+
+
+def test_context_budget_is_shared_with_num_ctx_sizing():
+    # 검색 청크가 압축 예산보다 크면 예산만큼만 num_ctx 계산에 들어감
+    budget = context_budget_tokens(2, 4000, max_tokens=2048)
+    assert budget == 2048
+    assert retrieval_context_tokens(2, 4000, history_chars=0, template_chars=0, max_context_tokens=budget) == 2048
+    # 검색 청크가 예산보다 작으면 청크 크기 그대로
+    assert context_budget_tokens(4, 1000, max_tokens=2048) == estimate_tokens(4000)
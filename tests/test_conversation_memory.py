@@ -0,0 +1,80 @@
+import time
+import threading
+
+from conversation_memory import ConversationBudget, clip_to_tokens, history_budget_tokens
+from inference_profiles import estimate_tokens
+
+
+class FakeLLM:
+    def __init__(self, reply="<think>생각</think>요약된 대화", gate=None):
+        self.reply = reply
+        self.gate = gate
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self.reply
+
+
+def _wait_for_summary(conversation, timeout=5):
+    deadline = time.time() + timeout
+    while conversation.stats()["pending_messages"] or conversation._summarizing:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def _history_tokens(history):
+    return sum(estimate_tokens(m["content"]) + 4 for m in history)
+
+
+def test_history_budget_leaves_room_for_context_and_generation():
+    assert history_budget_tokens(4096, 512, 2000, max_tokens=800) == 800
+    assert history_budget_tokens(4096, 512, 3300, max_tokens=800) == 284
+    assert history_budget_tokens(2048, 512, 3000) == 0
+
+
+def test_old_turns_roll_over_into_a_summary():
+    llm = FakeLLM()
+    conversation = ConversationBudget(llm=llm, budget_tokens=100, summary_ratio=0.3)
+    conversation.add_turn("가" * 50, "나" * 50)
+    conversation.add_turn("다" * 50, "라" * 50)
+    _wait_for_summary(conversation)
+
+    history = conversation.history()
+    assert history[0] == {"role": "system", "content": "이전 대화 요약: 요약된 대화"}
+    assert history[-1] == {"role": "assistant", "content": "라" * 50}
+    assert _history_tokens(history) <= 100
+    assert "가" * 50 in llm.prompts[0]
+    assert conversation.stats()["summarized"]
+
+
+def test_turns_are_dropped_without_a_summarizer():
+    conversation = ConversationBudget(llm=None, budget_tokens=100, summary_ratio=0.3)
+    for i in range(5):
+        conversation.add_turn(f"질문 {i} " + "가" * 40, f"답변 {i} " + "나" * 40)
+
+    history = conversation.history()
+    assert history[0]["role"] != "system"
+    assert history[-1]["content"].startswith("답변 4")
+    assert _history_tokens(history) <= 100
+    assert conversation.stats()["pending_messages"] == 0
+
+
+def test_clear_discards_a_summary_in_progress():
+    gate = threading.Event()
+    conversation = ConversationBudget(llm=FakeLLM(gate=gate), budget_tokens=100, summary_ratio=0.3)
+    conversation.add_turn("가" * 50, "나" * 50)
+    conversation.add_turn("다" * 50, "라" * 50)
+    conversation.clear()
+    gate.set()
+    _wait_for_summary(conversation)
+
+    assert conversation.summary == ""
+    assert conversation.history() == []
+
+
+def test_clip_to_tokens():
+    assert clip_to_tokens("짧은 글", 10) == "짧은 글"
+    assert clip_to_tokens("가" * 100, 10) == "가" * 24 + "…"
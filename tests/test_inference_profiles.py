@@ -0,0 +1,49 @@
+import inference_profiles
+from inference_profiles import Calibrator, inference_options, load_options
+
+
+def test_num_ctx_is_pinned_per_model(monkeypatch):
+    monkeypatch.setattr(Calibrator, "start", lambda self, model: None)
+    monkeypatch.setattr(inference_profiles, "_load_options", {})
+    base_url = "http://localhost:11434"
+
+    rag = inference_options(base_url, "llama3", 3200, profile_name="balanced")
+    basic = inference_options(base_url, "llama3", 0, profile_name="balanced")
+    assert basic["num_ctx"] == rag["num_ctx"] >= 3200 + rag["num_predict"]
+    assert basic["num_thread"] == rag["num_thread"]
+    assert load_options(base_url + "/", "llama3") == {"num_ctx": rag["num_ctx"], "num_thread": rag["num_thread"]}
+
+    # 다른 모델은 따로 정함
+    other = inference_options(base_url, "qwen2", 0, profile_name="balanced")
+    assert other["num_ctx"] == inference_profiles.NUM_CTX_MIN
+
+
+def test_num_predict_fits_pinned_num_ctx(monkeypatch):
+    monkeypatch.setattr(Calibrator, "start", lambda self, model: None)
+    monkeypatch.setattr(inference_profiles, "_load_options", {})
+    base_url = "http://ollama.internal:11434"
+
+    small = inference_options(base_url, "llama3", 0, profile_name="balanced")
+    assert "num_thread" not in small
+    larger = inference_options(base_url, "llama3", small["num_ctx"] - 200, profile_name="balanced")
+    assert larger["num_ctx"] == small["num_ctx"]
+    assert larger["num_predict"] == 200
+
+
+def test_load_options_treat_latest_tag_as_same_model(monkeypatch):
+    monkeypatch.setattr(Calibrator, "start", lambda self, model: None)
+    monkeypatch.setattr(inference_profiles, "_load_options", {})
+    options = inference_options("http://localhost:11434", "llama3.2", 1000, profile_name="balanced")
+    assert load_options("http://localhost:11434", "llama3.2:latest")["num_ctx"] == options["num_ctx"]
+
+
+def test_pinned_num_ctx_is_capped_when_model_length_arrives_later(monkeypatch):
+    monkeypatch.setattr(Calibrator, "start", lambda self, model: None)
+    monkeypatch.setattr(inference_profiles, "_load_options", {})
+    base_url = "http://localhost:11434"
+
+    # 카탈로그가 아직 /api/show 정보를 받기 전
+    first = inference_options(base_url, "llama3", 6000, profile_name="balanced")
+    assert first["num_ctx"] > 4096
+    later = inference_options(base_url, "llama3", 6000, profile_name="balanced", model_context_length=4096)
+    assert later["num_ctx"] == load_options(base_url, "llama3")["num_ctx"] == 4096
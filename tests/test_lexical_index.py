@@ -0,0 +1,103 @@
+import hashlib
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import (
+    BM25Index, filter_lexical_hits, hybrid_search, reciprocal_rank_fusion, strong_lexical_hit, tokenize,
+    vector_ranking
+)
+
+
+class HashEmbeddings(Embeddings):
+    """텍스트 해시로 시드를 정하는 무작위 벡터 (의미와 무관한 벡터 검색 순위를 재현)."""
+
+    def _embed(self, text):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=16).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def test_tokenize_korean_bigrams_and_exact_runs():
+    # 조사가 붙어도 같은 바이그램을 공유
+    assert set(tokenize("계약서의")) >= {"계약", "약서"}
+    assert set(tokenize("계약서를")) >= {"계약", "약서"}
+    # 숫자·영문이 섞인 묶음은 통째로도 남기고, 금액의 쉼표는 지움
+    assert tokenize("제3조") == ["제3조", "제", "3", "조"]
+    assert tokenize("1,000,000원") == ["1000000원", "1000000", "원"]
+    assert tokenize("ISO-9001") == ["iso-9001", "iso", "9001"]
+    assert tokenize("Payment terms") == ["payment", "terms"]
+
+
+def test_bm25_prefers_rare_terms_and_shorter_chunks():
+    index = BM25Index()
+    index.add(
+        ["common", "rare", "long"],
+        [
+            "계약 기간 계약 조건",
+            "계약 기간 위약금 조항",
+            "계약 기간 위약금 조항 " + "일반 사항 " * 30,
+        ]
+    )
+    assert len(index) == 3
+    ranked = [doc_id for doc_id, _ in index.search("위약금", 3)]
+    assert ranked == ["rare", "long"]
+    assert index.search("없는 단어", 3) == []
+    assert index.search("", 3) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    # 두 검색에 모두 나온 청크가 한쪽에서만 1위인 청크보다 앞섬
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]], k=60)
+    assert set(fused[:2]) == {"b", "c"}
+    assert fused[2:] == ["a", "d"]
+
+
+def _contract_store(pages=40, target_page=7):
+    texts = []
+    for page in range(pages):
+        text = f"본 계약의 당사자는 계약 금액과 지급 조건을 성실히 이행한다. 제{page + 1}조 일반 조항."
+        if page == target_page:
+            text += " 총 amount 7000 을 지급한다."
+        texts.append(text)
+    metadatas = [{"page": page} for page in range(pages)]
+    vectorstore = FAISS.from_texts(texts, HashEmbeddings(), metadatas=metadatas)
+    return vectorstore, BM25Index.from_vectorstore(vectorstore)
+
+
+def test_strong_bm25_hit_survives_fusion():
+    vectorstore, lexical_index = _contract_store()
+    query = "지급 금액 amount 7000"
+    hits = lexical_index.search(query, 20)
+    top_id, top_score = hits[0]
+    assert vectorstore.docstore.search(top_id).metadata["page"] == 7
+    assert top_score > 3 * hits[1][1]
+
+    # 벡터 검색 후보에는 없고, 가중치 없는 RRF에서는 흔한 바이그램만 겹친 청크들에 밀려남
+    embedding = vectorstore.embeddings.embed_query(query)
+    vector_ids = vector_ranking(vectorstore, embedding, 20)
+    assert top_id not in vector_ids
+    assert top_id not in reciprocal_rank_fusion([vector_ids, [doc_id for doc_id, _ in hits]])[:4]
+
+    documents = hybrid_search(vectorstore, lexical_index, query, embedding, k=4)
+    assert len(documents) == 4
+    assert 7 in [doc.metadata["page"] for doc in documents]
+
+
+def test_lexical_hits_are_thresholded_against_the_top_score():
+    hits = [("a", 5.0), ("b", 1.5), ("c", 0.5), ("d", 0.02)]
+    assert filter_lexical_hits(hits, min_ratio=0.2) == [("a", 5.0), ("b", 1.5)]
+    assert filter_lexical_hits([]) == []
+
+
+def test_strong_lexical_hit_requires_a_clear_margin():
+    assert strong_lexical_hit([("a", 5.0), ("b", 1.0)], ratio=3.0) == "a"
+    assert strong_lexical_hit([("a", 2.0), ("b", 1.0)], ratio=3.0) is None
+    assert strong_lexical_hit([("a", 0.5)]) == "a"
+    assert strong_lexical_hit([]) is None
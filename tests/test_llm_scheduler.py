@@ -0,0 +1,106 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_scheduler
+from llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler, request_context
+from streaming import StreamTimer, stream_retrieval_chain
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def _start_waiter(scheduler, order, name, session_id, priority, positions=None, hold=None):
+    def target():
+        on_wait = positions.append if positions is not None else None
+        with scheduler.slot(session_id, priority, on_wait):
+            order.append(name)
+            if hold is not None:
+                hold.wait(5)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def test_interactive_requests_run_before_background_and_rotate_sessions():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+    scheduler.acquire("holder", PRIORITY_INTERACTIVE)
+
+    threads = []
+    for name, session_id, priority in [
+        ("index-1", "indexer", PRIORITY_BACKGROUND),
+        ("a-1", "a", PRIORITY_INTERACTIVE),
+        ("a-2", "a", PRIORITY_INTERACTIVE),
+        ("b-1", "b", PRIORITY_INTERACTIVE),
+    ]:
+        threads.append(_start_waiter(scheduler, order, name, session_id, priority))
+        queued = len(threads)
+        _wait_until(lambda: scheduler.queue_length() == queued)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["a-1", "b-1", "a-2", "index-1"]
+
+
+def test_waiters_are_told_their_queue_position():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+    first_positions, second_positions = [], []
+    hold_first = threading.Event()
+    scheduler.acquire("holder", PRIORITY_INTERACTIVE)
+
+    first = _start_waiter(scheduler, order, "first", "a", PRIORITY_INTERACTIVE, first_positions, hold_first)
+    _wait_until(lambda: first_positions == [1])
+    second = _start_waiter(scheduler, order, "second", "b", PRIORITY_INTERACTIVE, second_positions)
+    _wait_until(lambda: second_positions == [2])
+
+    # 앞 요청이 슬롯을 얻으면 뒤 요청의 순서가 하나 당겨짐
+    scheduler.release()
+    _wait_until(lambda: second_positions == [2, 1])
+    hold_first.set()
+    first.join(timeout=5)
+    second.join(timeout=5)
+    assert first_positions == [1, 0]
+    assert second_positions == [2, 1, 0]
+    assert order == ["first", "second"]
+
+
+class _ExecutorChain:
+    """LCEL처럼 LLM 호출을 실행기 스레드에서 하는 가짜 체인입니다."""
+
+    def stream(self, inputs):
+        yield {"context": ["doc"]}
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            def generate():
+                with llm_scheduler.get_llm_scheduler().slot():
+                    return "answer"
+            yield {"answer": executor.submit(contextvars.copy_context().run, generate).result()}
+
+
+def test_stream_retrieval_chain_reports_positions_from_executor_threads(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=1)
+    monkeypatch.setattr(llm_scheduler, "_llm_scheduler", scheduler)
+    scheduler.acquire("holder", PRIORITY_INTERACTIVE)
+    caller = threading.current_thread()
+    positions = []
+
+    def on_wait(position):
+        # 대기 순서는 항상 호출 스레드에서 표시됨
+        assert threading.current_thread() is caller
+        positions.append(position)
+        if position:
+            scheduler.release()
+
+    with request_context("session", PRIORITY_INTERACTIVE):
+        items = list(stream_retrieval_chain(_ExecutorChain(), {}, StreamTimer(), on_wait=on_wait))
+
+    assert items == [("context", ["doc"]), ("token", "answer")]
+    assert positions == [1, 0]
@@ -0,0 +1,74 @@
+import threading
+
+import model_catalog
+from model_catalog import ModelCatalog
+from ollama_client import OllamaError
+
+
+class FakeClient:
+    def __init__(self):
+        self.tags_calls = 0
+        self.show_calls = 0
+        self.show_fails = False
+        self.release_tags = threading.Event()
+        self.release_tags.set()
+
+    def list_models(self):
+        self.tags_calls += 1
+        self.release_tags.wait(timeout=5)
+        return [{"name": "llama3.2:latest", "digest": "d1", "details": {"family": "llama"}}]
+
+    def show(self, name):
+        self.show_calls += 1
+        if self.show_fails:
+            raise OllamaError("일시적인 오류")
+        return {"model_info": {"llama.context_length": 131072}}
+
+
+def _catalog(monkeypatch, client):
+    monkeypatch.setattr(model_catalog, "get_ollama_client", lambda base_url: client)
+    return ModelCatalog("http://localhost:11434")
+
+
+def _join_refresh():
+    for thread in threading.enumerate():
+        if thread.name == "ollama-catalog":
+            thread.join(timeout=5)
+
+
+def test_failed_show_is_retried_on_next_fetch(monkeypatch):
+    client = FakeClient()
+    catalog = _catalog(monkeypatch, client)
+
+    client.show_fails = True
+    assert catalog.refresh().models["llama3.2:latest"].context_length is None
+
+    client.show_fails = False
+    assert catalog.refresh().models["llama3.2:latest"].context_length == 131072
+    catalog.refresh()
+    assert client.show_calls == 2
+
+
+def test_cold_snapshot_is_single_flight_and_fills_show_in_background(monkeypatch):
+    client = FakeClient()
+    catalog = _catalog(monkeypatch, client)
+
+    client.release_tags.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(catalog.snapshot())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    client.release_tags.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # 첫 스냅샷은 /api/tags 한 번으로 만들고 /api/show는 기다리지 않음
+    assert len(results) == 4
+    assert all(snapshot.healthy for snapshot in results)
+    assert any(snapshot.models["llama3.2:latest"].context_length is None for snapshot in results)
+
+    # 이어지는 백그라운드 갱신 한 번에서만 /api/tags와 /api/show를 다시 조회
+    _join_refresh()
+    assert client.tags_calls == 2
+    assert client.show_calls == 1
+    assert catalog.get("llama3.2").context_length == 131072
@@ -0,0 +1,56 @@
+import threading
+
+import model_manager
+from model_manager import ModelManager
+
+
+class FakeClient:
+    def __init__(self, running=None):
+        self.running = running or []
+        self.loaded = []
+        self.unloaded = []
+        self.ps_calls = 0
+
+    def running_models(self):
+        self.ps_calls += 1
+        return list(self.running)
+
+    def load_model(self, model, keep_alive, embedding=False, options=None):
+        self.loaded.append((model, options))
+        self.running.append({"name": model_manager.model_key(model), "size": 0})
+
+    def unload_model(self, model, embedding=False):
+        self.unloaded.append(model)
+        self.running = [m for m in self.running if m["name"] != model]
+
+
+def _manager(monkeypatch, client, **kwargs):
+    monkeypatch.setattr(model_manager, "get_ollama_client", lambda base_url: client)
+    return ModelManager("http://localhost:11434", **kwargs)
+
+
+def test_preload_sends_pinned_load_options(monkeypatch):
+    import inference_profiles
+    monkeypatch.setattr(inference_profiles, "load_options", lambda base_url, model: {"num_ctx": 4096, "num_thread": 4})
+    client = FakeClient()
+    manager = _manager(monkeypatch, client)
+
+    manager.ensure_loaded("llama3.2")
+    assert client.loaded == [("llama3.2", {"num_ctx": 4096, "num_thread": 4})]
+
+
+def test_request_finished_refreshes_resident_models_and_unloads_idle(monkeypatch):
+    client = FakeClient(running=[{"name": "old:latest", "size": 600}])
+    manager = _manager(monkeypatch, client, idle_seconds=0, max_resident_bytes=1000, min_free_bytes=0)
+    monkeypatch.setattr(model_manager, "available_memory_bytes", lambda: None)
+    assert manager.is_resident("old")
+
+    # 다른 모델이 요청으로 올라와 상한을 넘음
+    client.running.append({"name": "llama3.2:latest", "size": 600})
+    threads_before = set(threading.enumerate())
+    manager.request_finished("llama3.2")
+    for thread in set(threading.enumerate()) - threads_before:
+        thread.join(timeout=5)
+
+    assert client.unloaded == ["old:latest"]
+    assert manager.is_resident("llama3.2") and not manager.is_resident("old")
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_scheduler
+import ollama_client
+from llm_scheduler import LLMScheduler
+from ollama_client import CircuitBreaker, OllamaClient
+
+
+def _breaker(monkeypatch, now, **kwargs):
+    monkeypatch.setattr(ollama_client.time, "monotonic", lambda: now[0])
+    return CircuitBreaker(**kwargs)
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    now = [100.0]
+    breaker = _breaker(monkeypatch, now, failure_threshold=3, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_allows_one_trial_request(monkeypatch):
+    now = [100.0]
+    breaker = _breaker(monkeypatch, now, failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+
+    now[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_reopens_the_breaker(monkeypatch):
+    now = [100.0]
+    breaker = _breaker(monkeypatch, now, failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    now[0] += 30
+    assert breaker.allow()
+
+
+class _FakeStreamResponse:
+    encoding = None
+
+    def iter_lines(self, decode_unicode=False):
+        yield from ["a", "b", "c"]
+
+    def close(self):
+        pass
+
+
+def test_stream_slot_is_held_across_threads_resuming_the_generator(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=1)
+    monkeypatch.setattr(llm_scheduler, "_llm_scheduler", scheduler)
+    client = OllamaClient("http://localhost:11434")
+    monkeypatch.setattr(client, "request", lambda *args, **kwargs: _FakeStreamResponse())
+    lines = client.stream_lines("/api/generate", {})
+    entered = threading.Event()
+
+    def other_request():
+        with scheduler.slot():
+            entered.set()
+
+    # LCEL처럼 제너레이터를 서로 다른 실행기 스레드에서 이어 실행
+    with ThreadPoolExecutor(max_workers=1) as first, ThreadPoolExecutor(max_workers=1) as second:
+        assert first.submit(next, lines).result() == "a"
+        assert second.submit(next, lines).result() == "b"
+        # 스트림을 시작한 스레드의 다른 요청도 슬롯이 빌 때까지 기다려야 함
+        waiting = first.submit(other_request)
+        assert not entered.wait(0.2)
+        assert scheduler.stats()["active"] == 1
+
+        assert second.submit(list, lines).result() == ["c"]
+        waiting.result(timeout=5)
+    assert entered.is_set()
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,33 @@
+import io
+
+from pypdf import PdfWriter
+
+from pdf_extract import _shard_ranges, assemble_pages, iter_page_batches
+
+
+def _blank_pdf(pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(100, 100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_shard_ranges_cover_every_page_once():
+    assert _shard_ranges(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert _shard_ranges(2, 4) == [(0, 1), (1, 2)]
+
+
+def test_assemble_pages_orders_pages_and_offsets():
+    text, pages = assemble_pages([(1, "bb"), (0, "a")])
+    assert text == "abb"
+    assert [(p.page, p.start, p.end) for p in pages] == [(0, 0, 1), (1, 1, 3)]
+
+
+def test_parallel_page_batches_keep_page_order():
+    pdf_bytes = _blank_pdf(40)
+    batches = list(iter_page_batches(pdf_bytes, batch_pages=8, workers=3))
+    assert len(batches[0]) == 8
+    assert all(0 < len(batch) <= 8 for batch in batches)
+    assert [page for batch in batches for page, _ in batch] == list(range(40))
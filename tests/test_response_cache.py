@@ -0,0 +1,79 @@
+from langchain_core.outputs import Generation
+
+import response_cache
+from response_cache import CachedStream, ResponseCache
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(path=str(tmp_path / "responses.sqlite3"), **kwargs)
+
+
+def test_key_depends_on_prompt_and_llm_string(tmp_path):
+    cache = _cache(tmp_path)
+    cache.update("질문", "llama3-temperature0.7", [Generation(text="답변")])
+
+    assert [g.text for g in cache.lookup("질문", "llama3-temperature0.7")] == ["답변"]
+    assert cache.lookup("질문", "llama3-temperature0.2") is None
+    assert cache.lookup("다른 질문", "llama3-temperature0.7") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert ResponseCache._key("a", "b") != ResponseCache._key("b", "a")
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = _cache(tmp_path, ttl=60)
+    cache.update("질문", "llm", [Generation(text="답변")])
+
+    now[0] += 59
+    assert cache.lookup("질문", "llm") is not None
+    now[0] += 2
+    assert cache.lookup("질문", "llm") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_empty_responses_are_not_stored(tmp_path):
+    cache = _cache(tmp_path)
+    cache.update("질문", "llm", [Generation(text="")])
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_size_cap(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = _cache(tmp_path, max_bytes=250)
+    for name in ("a", "b"):
+        now[0] += 1
+        cache.update(name, "llm", [Generation(text=name * 100)])
+    now[0] += 1
+    cache.lookup("a", "llm")
+    now[0] += 1
+    cache.update("c", "llm", [Generation(text="c" * 100)])
+
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") is not None
+    assert cache.lookup("c", "llm") is not None
+
+
+class FakeLLM:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.calls = 0
+
+    def dict(self):
+        return {"model": "fake", "temperature": 0.7}
+
+    def stream(self, prompt):
+        self.calls += 1
+        yield from self.tokens
+
+
+def test_cached_stream_generates_once(tmp_path):
+    cache = _cache(tmp_path)
+    llm = FakeLLM(["안녕", "하세요"])
+
+    first = CachedStream(llm, "인사", cache=cache)
+    assert list(first) == ["안녕", "하세요"] and not first.hit
+    second = CachedStream(llm, "인사", cache=cache)
+    assert list(second) == ["안녕하세요"] and second.hit
+    assert llm.calls == 1
@@ -0,0 +1,49 @@
+import faiss
+import numpy as np
+import pytest
+
+import vector_index
+from vector_index import build_index, choose_index_type, index_type_of, optimize_index
+
+
+def _flat_index(n_vectors, dim=32):
+    vectors = np.random.default_rng(0).normal(size=(n_vectors, dim)).astype(np.float32)
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    return index, vectors
+
+
+def test_choose_index_type_by_vector_count():
+    assert choose_index_type(10) == "flat"
+    assert choose_index_type(vector_index.FAISS_FLAT_MAX_VECTORS + 1) == "hnsw"
+    assert choose_index_type(vector_index.FAISS_IVF_MAX_VECTORS + 1) == "ivfpq"
+    assert choose_index_type(10, "ivf") == "ivf"
+
+
+def test_flat_index_is_returned_without_benchmark(monkeypatch):
+    flat, _ = _flat_index(100)
+    monkeypatch.setattr(vector_index, "benchmark_index", lambda *args, **kwargs: pytest.fail("평면 인덱스를 측정함"))
+    index, report = optimize_index(flat, "auto")
+    assert index is flat
+    assert report is None
+
+
+def test_recall_report_for_rebuilt_index():
+    flat, _ = _flat_index(2000)
+    index, report = optimize_index(flat, "hnsw")
+
+    assert index_type_of(index) == "hnsw"
+    assert index.ntotal == flat.ntotal
+    assert report.index_type == "hnsw"
+    assert report.vectors == 2000
+    assert 0.9 <= report.recall <= 1.0
+    assert report.latency_ms > 0 and report.flat_latency_ms > 0
+    assert report.build_seconds >= 0
+
+
+def test_ivfpq_falls_back_to_ivf_for_small_corpora():
+    _, vectors = _flat_index(vector_index.PQ_MIN_TRAIN_VECTORS - 1)
+    assert index_type_of(build_index("ivfpq", vectors)) == "ivf"
+
+    _, vectors = _flat_index(vector_index.PQ_MIN_TRAIN_VECTORS * 2)
+    assert index_type_of(build_index("ivfpq", vectors)) == "ivfpq"
@@ -0,0 +1,142 @@
+import os
+import math
+import time
+from collections import namedtuple
+
+import faiss
+import numpy as np
+
+# 사용할 FAISS 인덱스 종류 ("auto"면 벡터 수로 선택, flat / hnsw / ivf / ivfpq로 고정 가능)
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "auto")
+# auto일 때 인덱스 종류를 바꾸는 벡터 수 경계
+FAISS_FLAT_MAX_VECTORS = int(os.environ.get("FAISS_FLAT_MAX_VECTORS", "20000"))
+FAISS_HNSW_MAX_VECTORS = int(os.environ.get("FAISS_HNSW_MAX_VECTORS", "200000"))
+FAISS_IVF_MAX_VECTORS = int(os.environ.get("FAISS_IVF_MAX_VECTORS", "1000000"))
+# 검색 정확도와 속도를 조절하는 값 (클수록 재현율이 높고 느려짐)
+FAISS_HNSW_EF_SEARCH = int(os.environ.get("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NPROBE = int(os.environ.get("FAISS_IVF_NPROBE", "16"))
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+# PQ 코드 하나가 8비트(256개 중심점)이므로 학습에 필요한 최소 벡터 수
+PQ_MIN_TRAIN_VECTORS = 256
+# 평면 인덱스와 비교할 때 쓰는 질의 수와 k
+BENCHMARK_QUERIES = 64
+BENCHMARK_K = 10
+
+IndexReport = namedtuple(
+    "IndexReport",
+    ["index_type", "vectors", "recall", "latency_ms", "flat_latency_ms", "build_seconds"]
+)
+
+
+def choose_index_type(n_vectors, index_type=FAISS_INDEX_TYPE):
+    """벡터 수에 맞는 인덱스 종류를 고릅니다 (index_type이 "auto"가 아니면 그대로 사용)."""
+    if index_type != "auto":
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 FAISS 인덱스 종류입니다: {index_type}")
+        return index_type
+    if n_vectors <= FAISS_FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= FAISS_HNSW_MAX_VECTORS:
+        return "hnsw"
+    if n_vectors <= FAISS_IVF_MAX_VECTORS:
+        return "ivf"
+    return "ivfpq"
+
+
+def index_type_of(index):
+    """FAISS 인덱스 객체의 종류 이름을 반환합니다."""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def _ivf_nlist(n_vectors):
+    # 클러스터 수는 약 4√n, 클러스터마다 학습 벡터가 39개 이상 되도록 제한
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def _pq_subquantizers(dim):
+    # 차원을 나누어떨어지게 하면서 부분 벡터가 8차원 이상인 가장 큰 부분 양자화기 수
+    for m in (96, 64, 48, 32, 24, 16, 8, 4, 2):
+        if dim % m == 0 and dim // m >= 8:
+            return m
+    return 1
+
+
+def build_index(index_type, vectors, metric=faiss.METRIC_L2):
+    """벡터 배열(n × dim, float32)로 지정한 종류의 인덱스를 만듭니다."""
+    n_vectors, dim = vectors.shape
+    if index_type == "ivfpq" and n_vectors < PQ_MIN_TRAIN_VECTORS:
+        index_type = "ivf"
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+    elif index_type in ("ivf", "ivfpq"):
+        nlist = _ivf_nlist(n_vectors)
+        quantizer = faiss.IndexFlat(dim, metric)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8, metric)
+        index.train(vectors)
+        index.nprobe = min(FAISS_IVF_NPROBE, nlist)
+    else:
+        index = faiss.IndexFlat(dim, metric)
+    index.add(vectors)
+    return index
+
+
+def benchmark_index(index, flat_index, vectors, k=BENCHMARK_K, queries=BENCHMARK_QUERIES):
+    """저장된 벡터에 작은 잡음을 더한 질의로 평면 인덱스 대비 재현율@k와 질의당 지연(ms)을 잽니다.
+
+    (재현율, 지연, 평면 인덱스 지연)을 반환합니다.
+    """
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)]
+    sample = sample + rng.normal(0, 0.01 * float(vectors.std() or 1.0), sample.shape).astype(np.float32)
+    k = min(k, len(vectors))
+
+    start = time.perf_counter()
+    _, expected = flat_index.search(sample, k)
+    flat_latency_ms = (time.perf_counter() - start) * 1000 / len(sample)
+
+    start = time.perf_counter()
+    _, found = index.search(sample, k)
+    latency_ms = (time.perf_counter() - start) * 1000 / len(sample)
+
+    hits = 0
+    for expected_row, found_row in zip(expected, found):
+        hits += len(set(expected_row.tolist()) & set(found_row.tolist()) - {-1})
+    recall = hits / float(len(sample) * k)
+    return recall, latency_ms, flat_latency_ms
+
+
+def optimize_index(flat_index, index_type=FAISS_INDEX_TYPE):
+    """평면 인덱스를 벡터 수에 맞는 인덱스로 다시 만들고 (새 인덱스, IndexReport)를 반환합니다.
+
+    평면 인덱스가 그대로 맞으면 벡터를 꺼내거나 측정하지 않고 (같은 객체, None)을 반환합니다.
+    """
+    n_vectors = flat_index.ntotal
+    chosen = choose_index_type(n_vectors, index_type)
+    if chosen == "flat":
+        return flat_index, None
+
+    vectors = flat_index.reconstruct_n(0, n_vectors)
+    start = time.perf_counter()
+    index = build_index(chosen, vectors, flat_index.metric_type)
+    build_seconds = time.perf_counter() - start
+
+    recall, latency_ms, flat_latency_ms = benchmark_index(index, flat_index, vectors)
+    report = IndexReport(
+        index_type_of(index), n_vectors, recall, latency_ms, flat_latency_ms, build_seconds
+    )
+    return index, report